@@ -6,24 +6,99 @@ A dice function takes no arguments and returns a number from 1 to n
 Types of dice:
 
  -  Dice can be fair, meaning that they produce each possible outcome with equal
-    probability.
+    probability.  A fair die may be given its own seeded random generator, so
+    that its rolls are reproducible, and may generate its rolls in blocks.
 
  -  For testing functions that use dice, we use deterministic dice that always
     cycle among a fixed set of values when rolled.
 """
 
-from random import randint
+import itertools
+import random
 
-def make_fair_dice(sides):
-    """Return a die that returns 1 to SIDES with equal chance."""
+def random_generator(rng=None):
+    """Return a source of random numbers for RNG, which may be None for the
+    shared generator of the random module, a seed for a new random.Random, or
+    a generator to use as it is.
+
+    >>> random_generator() is random
+    True
+    >>> random_generator(7).random() == random.Random(7).random()
+    True
+    """
+    if rng is None:
+        return random # The module's functions use its shared generator
+    if isinstance(rng, (int, float, str, bytes, bytearray)):
+        return random.Random(rng)
+    return rng
+
+def make_fair_dice(sides, rng=None):
+    """Return a die that returns 1 to SIDES with equal chance.  The number of
+    SIDES of a fair die is also its sides attribute.  Outcomes are drawn from
+    random_generator(RNG), so dice given equal seeds roll equal outcomes.
+    RNG may also be a numpy.random.Generator.
+
+    >>> make_fair_dice(4).sides
+    4
+    >>> dice0, dice1 = make_fair_dice(6, 61), make_fair_dice(6, 61)
+    >>> [dice0() for _ in range(8)] == [dice1() for _ in range(8)]
+    True
+    """
     assert type(sides) == int and sides >= 1, 'Illegal value for sides'
-    def dice():
-        return randint(1,sides)
+    rng = random_generator(rng)
+    if hasattr(rng, 'integers'): # A NumPy generator
+        def dice():
+            return int(rng.integers(1, sides + 1))
+    else:
+        randint = rng.randint
+        def dice():
+            return randint(1,sides)
+    dice.sides = sides
     return dice
 
 four_sided = make_fair_dice(4)
 six_sided = make_fair_dice(6)
 
+def make_buffered_dice(sides, rng=None, block_size=4096):
+    """Return a fair die like make_fair_dice(SIDES, RNG), which generates
+    BLOCK_SIZE random bytes at a time and serves the outcomes they encode.
+    RNG may also be a numpy.random.Generator, which generates the outcomes
+    of each block directly.
+
+    SIDES is at most 255, the largest outcome that fits in a byte.  Each byte
+    below the largest multiple of SIDES that fits in a byte encodes an outcome
+    by its remainder modulo SIDES; other bytes are discarded, so that every
+    outcome is equally likely.
+
+    >>> dice = make_buffered_dice(6, 2024)
+    >>> rolls = [dice() for _ in range(10000)]
+    >>> min(rolls), max(rolls), dice.sides
+    (1, 6, 6)
+    >>> dice0, dice1 = make_buffered_dice(6, 5), make_buffered_dice(6, 5)
+    >>> [dice0() for _ in range(5000)] == [dice1() for _ in range(5000)]
+    True
+    """
+    assert type(sides) == int and 1 <= sides <= 255, 'Illegal value for sides'
+    rng = random_generator(rng)
+    if hasattr(rng, 'integers'): # A NumPy generator
+        def blocks():
+            while True:
+                yield rng.integers(1, sides + 1, block_size, 'uint8').tobytes()
+    else:
+        limit = 256 - 256 % sides
+        table = bytes(b % sides + 1 if b < limit else 0 for b in range(256))
+        discard = bytes(range(limit, 256))
+        def blocks():
+            while True:
+                bits = rng.getrandbits(8 * block_size)
+                block = bits.to_bytes(block_size, 'little')
+                yield block.translate(table, discard)
+    rolls = itertools.chain.from_iterable(blocks())
+    def dice():
+        return next(rolls)
+    dice.sides = sides
+    return dice
+
 def make_test_dice(*outcomes):
     """Return a die that cycles deterministically through OUTCOMES.
 
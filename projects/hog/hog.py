@@ -1,8 +1,19 @@
 """The Game of Hog."""
 
+import inspect
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from dice import four_sided, six_sided
+from fractions import Fraction
+from functools import lru_cache
 from ucb import main
-from typing import Callable, Tuple, Any
+from typing import Callable, Dict, List, Sequence, Tuple, Any
+
+try:
+    import numpy as np
+except ImportError:  # Batched simulation is unavailable without NumPy
+    np = None
 
 GOAL_SCORE = 100  # The goal of Hog is to score 100 points.
 
@@ -204,10 +215,15 @@ def make_averaged(
     return averaged
 
 
-def max_scoring_num_rolls(dice: Callable[[], int] = six_sided) -> int:
+def max_scoring_num_rolls(
+    dice: Callable[[], int] = six_sided, batch: bool = False, seed: int | None = None
+) -> int:
     """Return the number of dice (1 to 10) that gives the highest average turn
     score by calling roll_dice with the provided DICE.  Print all averages as in
     the doctest below.  Assume that dice always returns positive outcomes.
+    The averages of fair dice are exact, rather than sampled, unless BATCH is
+    true, in which case they are sampled by batch_averaged_roll with a NumPy
+    generator seeded with SEED.
 
     >>> from dice import make_test_dice
     >>> dice = make_test_dice(3)
@@ -224,11 +240,21 @@ def max_scoring_num_rolls(dice: Callable[[], int] = six_sided) -> int:
     10 dice scores 30.0 on average
     10
     """
+    sides = getattr(dice, "sides", None)  # Only fair dice have sides
     average_roll = make_averaged(roll_dice, 1000000)
+    if batch and sides is not None:
+        if np is None:
+            raise ImportError("batched dice simulation requires NumPy")
+        rng = np.random.default_rng(seed)
     best_play = 0
     best_roll = 0.0
     for num_rolls in range(1, 11):
-        roll = average_roll(num_rolls, dice)
+        if batch and sides is not None:
+            roll = batch_averaged_roll(num_rolls, sides, rng=rng)
+        elif sides is not None:
+            roll = float(expected_roll_score(num_rolls, sides))
+        else:
+            roll = average_roll(num_rolls, dice)
         print(f"{num_rolls} dice scores {roll:.1f} on average")
         if roll > best_roll:
             best_play, best_roll = num_rolls, roll
@@ -256,25 +282,448 @@ def average_win_rate(
     return (win_rate_as_player_0 + win_rate_as_player_1) / 2  # Average results
 
 
-def run_experiments() -> None:
-    """Run a series of strategy experiments and report results."""
+def run_experiments(batch: bool = False) -> None:
+    """Run a series of strategy experiments and report results.  If BATCH,
+    dice are simulated in batches with NumPy."""
     if False:  # Change to False when done finding max_scoring_num_rolls
-        six_sided_max = max_scoring_num_rolls(six_sided)
+        six_sided_max = max_scoring_num_rolls(six_sided, batch)
         print("Max scoring num rolls for six-sided dice:", six_sided_max)
-        four_sided_max = max_scoring_num_rolls(four_sided)
+        four_sided_max = max_scoring_num_rolls(four_sided, batch)
         print("Max scoring num rolls for four-sided dice:", four_sided_max)
 
+    win_rate = batch_win_rate if batch else average_win_rate
+
     if True:  # Change to True to test always_roll(8)
-        print("always_roll(8) win rate:", average_win_rate(always_roll(8)))
+        print("always_roll(8) win rate:", win_rate(always_roll(8)))
 
     if True:  # Change to True to test bacon_strategy
-        print("bacon_strategy win rate:", average_win_rate(bacon_strategy))
+        print("bacon_strategy win rate:", win_rate(bacon_strategy))
 
     if True:  # Change to True to test swap_strategy
-        print("swap_strategy win rate:", average_win_rate(swap_strategy))
+        print("swap_strategy win rate:", win_rate(swap_strategy))
 
     if True:  # Change to True to test final_strategy
-        print("final_strategy win rate:", average_win_rate(final_strategy))
+        print("final_strategy win rate:", win_rate(final_strategy))
+
+
+# Exact probabilities
+
+
+@lru_cache(maxsize=None)
+def roll_counts(num_rolls: int, sides: int) -> Tuple[Tuple[int, int], ...]:
+    """Return the number of ways, out of SIDES ** NUM_ROLLS equally likely
+    outcomes, that roll_dice(NUM_ROLLS, dice) scores each turn score, for fair
+    DICE with SIDES sides, as (turn score, ways) pairs in increasing order.
+
+    Sums are counted by dynamic programming over the dice rolled, considering
+    only outcomes of 2 or more; every other outcome is a Pig Out.
+
+    >>> roll_counts(2, 4)
+    ((1, 7), (4, 1), (5, 2), (6, 3), (7, 2), (8, 1))
+    """
+    ways = {0: 1}  # Ways to reach each sum without rolling a 1
+    for _ in range(num_rolls):
+        rolled = {}
+        for total, count in ways.items():
+            for outcome in range(2, sides + 1):
+                rolled[total + outcome] = rolled.get(total + outcome, 0) + count
+        ways = rolled
+    pig_out = sides**num_rolls - sum(ways.values())
+    counts = sorted(ways.items())
+    return ((1, pig_out),) + tuple(counts) if pig_out else tuple(counts)
+
+
+def roll_distribution(num_rolls: int, sides: int) -> Dict[int, Fraction]:
+    """Return the exact probability of each turn score of
+    roll_dice(NUM_ROLLS, dice) for fair DICE with SIDES sides.
+
+    >>> distribution = roll_distribution(2, 6)
+    >>> distribution[1], distribution[12]
+    (Fraction(11, 36), Fraction(1, 36))
+    >>> sum(distribution.values())
+    Fraction(1, 1)
+    """
+    total = sides**num_rolls
+    return {
+        score: Fraction(ways, total) for score, ways in roll_counts(num_rolls, sides)
+    }
+
+
+def expected_roll_score(num_rolls: int, sides: int) -> Fraction:
+    """Return the exact average turn score of roll_dice(NUM_ROLLS, dice) for
+    fair DICE with SIDES sides.
+
+    >>> expected_roll_score(1, 6)
+    Fraction(7, 2)
+    >>> expected_roll_score(2, 4)
+    Fraction(61, 16)
+    """
+    total = sides**num_rolls
+    counts = roll_counts(num_rolls, sides)
+    return Fraction(sum(score * ways for score, ways in counts), total)
+
+
+@lru_cache(maxsize=None)
+def roll_chances(num_rolls: int, sides: int) -> Tuple[Tuple[int, float], ...]:
+    """Return the (turn score, probability) pairs of roll_dice(NUM_ROLLS, dice)
+    for fair DICE with SIDES sides, with probabilities as floats.
+
+    >>> roll_chances(1, 4)
+    ((1, 0.25), (2, 0.25), (3, 0.25), (4, 0.25))
+    """
+    total = sides**num_rolls
+    counts = roll_counts(num_rolls, sides)
+    return tuple((score, ways / total) for score, ways in counts)
+
+
+# Exact win rates
+
+
+def later_states_first(goal: int = GOAL_SCORE):
+    """Yield each state (score, opponent_score) of a game to GOAL, after every
+    state with a larger sum of scores, which may follow it.
+
+    >>> list(later_states_first(2))
+    [(1, 1), (0, 1), (1, 0), (0, 0)]
+    """
+    for total in range(2 * goal - 2, -1, -1):
+        for score in range(max(0, total - goal + 1), min(total, goal - 1) + 1):
+            yield score, total - score
+
+
+def turn_win_chance(
+    num_rolls: int,
+    score: int,
+    opponent_score: int,
+    opponent_chances: List[List[float]],
+    goal: int = GOAL_SCORE,
+) -> float:
+    """Return the chance that a player with SCORE against OPPONENT_SCORE wins
+    by rolling NUM_ROLLS fair dice this turn, following the rules of play.
+    OPPONENT_CHANCES[s][o] is the chance that the opponent wins when about to
+    take a turn with score s against o, for every state that may follow.
+    """
+    if num_rolls == 0:
+        outcomes = ((free_bacon(opponent_score), 1.0),)
+    else:
+        outcomes = roll_chances(num_rolls, select_dice(score, opponent_score).sides)
+    chance = 0.0
+    for turn_score, probability in outcomes:
+        new_score, new_opponent = score + turn_score, opponent_score
+        # swine swap rule
+        if new_score == 2 * new_opponent or 2 * new_score == new_opponent:
+            new_score, new_opponent = new_opponent, new_score
+        if new_score >= goal:
+            chance += probability
+        elif new_opponent < goal:
+            chance += probability * (1 - opponent_chances[new_opponent][new_score])
+    return chance
+
+
+def win_probability(
+    strategy0: Callable[[int, int], int],
+    strategy1: Callable[[int, int], int],
+    goal: int = GOAL_SCORE,
+) -> float:
+    """Return the probability that Player 0 wins a game of play between
+    STRATEGY0 and STRATEGY1, which must be deterministic, with fair dice.
+
+    Every turn adds to the sum of the scores, so the chance of winning from
+    each state (score, opponent_score, who) depends only on states with a
+    larger sum, which are computed first.
+
+    >>> win_probability(always_roll(0), always_roll(0), 3)
+    1.0
+    >>> round(win_probability(always_roll(5), always_roll(5)), 6)
+    0.499035
+    """
+    strategies = (strategy0, strategy1)
+    # chances[who][score][opponent_score] is the chance that WHO, about to
+    # take a turn with SCORE against OPPONENT_SCORE, wins the game.
+    chances = [[[0.0] * goal for _ in range(goal)] for _ in range(2)]
+    for score, opponent_score in later_states_first(goal):
+        for who in (0, 1):
+            num_rolls = strategies[who](score, opponent_score)
+            assert 0 <= num_rolls <= 10, "Strategies roll 0 to 10 dice."
+            chances[who][score][opponent_score] = turn_win_chance(
+                num_rolls, score, opponent_score, chances[other(who)], goal
+            )
+    return chances[0][0][0]
+
+
+def exact_win_rate(
+    strategy: Callable[[int, int], int],
+    baseline: Callable[[int, int], int] = always_roll(BASELINE_NUM_ROLLS),
+) -> float:
+    """Return the exact win rate (0 to 1) of STRATEGY against BASELINE, which
+    average_win_rate estimates by simulation.  Both must be deterministic.
+
+    >>> round(exact_win_rate(always_roll(5)), 6)
+    0.5
+    """
+    win_rate_as_player_0 = win_probability(strategy, baseline)
+    win_rate_as_player_1 = 1 - win_probability(baseline, strategy)
+    return (win_rate_as_player_0 + win_rate_as_player_1) / 2
+
+
+# Batched simulation
+
+
+def batch_roll_dice(num_rolls: int, sides: int, samples: int, rng=None):
+    """Return a NumPy array of the turn scores of SAMPLES independent calls to
+    roll_dice(NUM_ROLLS, dice) for fair DICE with SIDES sides.  All dice are
+    rolled at once as a SAMPLES x NUM_ROLLS array, drawn from RNG, a
+    numpy.random.Generator (by default, a new unseeded one).
+    """
+    if np is None:
+        raise ImportError("batched dice simulation requires NumPy")
+    assert num_rolls > 0, "Must roll at least once."
+    if rng is None:
+        rng = np.random.default_rng()
+    rolls = rng.integers(1, sides + 1, size=(samples, num_rolls), dtype=np.int8)
+    pig_out = (rolls == 1).any(axis=1)  # check pig out rule
+    return np.where(pig_out, 1, rolls.sum(axis=1, dtype=np.int64))
+
+
+def batch_averaged_roll(
+    num_rolls: int, sides: int, samples: int = 1000000, rng=None
+) -> float:
+    """Return the average of SAMPLES turn scores of roll_dice(NUM_ROLLS, dice)
+    for fair DICE with SIDES sides, simulated by batch_roll_dice.  Samples are
+    rolled in blocks to bound memory.
+
+    >>> mean = expected = float(expected_roll_score(3, 6))
+    >>> if np is not None:  # Only sampled with NumPy
+    ...     mean = batch_averaged_roll(3, 6, 200000, np.random.default_rng(1))
+    >>> abs(mean - expected) < 0.1
+    True
+    """
+    block, total, remaining = 100000, 0, samples
+    if rng is None and np is not None:
+        rng = np.random.default_rng()
+    while remaining > 0:
+        count = min(block, remaining)
+        total += int(batch_roll_dice(num_rolls, sides, count, rng).sum())
+        remaining -= count
+    return total / samples
+
+
+def strategy_array(strategy: Callable[[int, int], int], goal: int = GOAL_SCORE):
+    """Return a GOAL x GOAL NumPy array of the number of dice that STRATEGY
+    rolls for each (score, opponent_score)."""
+    if np is None:
+        raise ImportError("batched game simulation requires NumPy")
+    return np.frombuffer(tabulate(strategy, goal), dtype=np.int8).reshape(goal, goal)
+
+
+def batch_play(table0, table1, games: int, rng=None, goal: int = GOAL_SCORE):
+    """Simulate GAMES games of play at once and return NumPy arrays of the final
+    scores of Player 0 and of Player 1.  Player 0 rolls the number of dice in
+    TABLE0 for each state, and Player 1 those in TABLE1, both GOAL x GOAL
+    arrays as returned by strategy_array.  Dice are drawn from RNG, a
+    numpy.random.Generator (by default, a new unseeded one).
+
+    All unfinished games take a turn together, as operations on arrays of the
+    scores of the current player and the opponent in each of them.
+    """
+    if np is None:
+        raise ImportError("batched game simulation requires NumPy")
+    if rng is None:
+        rng = np.random.default_rng()
+    tables = np.stack([table0, table1])
+    scores = np.zeros((games, 2), dtype=np.int64)
+    who = np.zeros(games, dtype=np.int64)  # The player about to take a turn
+    active = np.arange(games)  # The indices of unfinished games
+    while active.size:
+        current = who[active]
+        score = scores[active, current]
+        opponent_score = scores[active, 1 - current]
+        num_rolls = tables[current, score, opponent_score]
+
+        # take turn, with six-sided dice unless Hog wild selects four-sided
+        sides = np.where((score + opponent_score) % 7 == 0, 4, 6)
+        rolls = rng.integers(
+            1, sides[:, None] + 1, size=(active.size, 10), dtype=np.int8
+        )
+        rolled = np.arange(10) < num_rolls[:, None]  # Dice past num_rolls are unused
+        pig_out = ((rolls == 1) & rolled).any(axis=1)
+        total = np.where(pig_out, 1, np.where(rolled, rolls, 0).sum(axis=1))
+        free_bacon = np.maximum(opponent_score // 10, opponent_score % 10) + 1
+        score = score + np.where(num_rolls == 0, free_bacon, total)
+
+        # swine swap rule
+        swap = (score == 2 * opponent_score) | (2 * score == opponent_score)
+        score, opponent_score = (
+            np.where(swap, opponent_score, score),
+            np.where(swap, score, opponent_score),
+        )
+        scores[active, current] = score
+        scores[active, 1 - current] = opponent_score
+
+        # switch to the other player
+        who[active] = 1 - current
+        active = active[np.maximum(score, opponent_score) < goal]
+    return scores[:, 0], scores[:, 1]
+
+
+def batch_win_rate(
+    strategy: Callable[[int, int], int],
+    baseline: Callable[[int, int], int] = always_roll(BASELINE_NUM_ROLLS),
+    games: int = 1000000,
+    seed: int | None = None,
+) -> float:
+    """Return the win rate (0 to 1) of STRATEGY against BASELINE, as
+    average_win_rate does, from GAMES games as each player simulated by
+    batch_play with a NumPy generator seeded with SEED.
+
+    >>> rate = exact = exact_win_rate(always_roll(8))
+    >>> if np is not None:  # Only simulated with NumPy
+    ...     rate = batch_win_rate(always_roll(8), games=20000, seed=1)
+    >>> abs(rate - exact) < 0.02
+    True
+    """
+    if np is None:
+        raise ImportError("batched game simulation requires NumPy")
+    rng = np.random.default_rng(seed)
+    strategy_table, baseline_table = strategy_array(strategy), strategy_array(baseline)
+    score0, score1 = batch_play(strategy_table, baseline_table, games, rng)
+    win_rate_as_player_0 = np.mean(score0 > score1)
+    score0, score1 = batch_play(baseline_table, strategy_table, games, rng)
+    win_rate_as_player_1 = np.mean(score0 <= score1)
+    return float(win_rate_as_player_0 + win_rate_as_player_1) / 2
+
+
+# Optimal strategy
+
+
+def optimal_table(goal: int = GOAL_SCORE) -> array:
+    """Return the number of dice that maximizes the chance of winning a game to
+    GOAL from each state, against an opponent who also plays optimally.  The
+    result is an array of GOAL * GOAL signed bytes, with the number of dice for
+    (score, opponent_score) at index score * GOAL + opponent_score.
+
+    The game is solved as in win_probability, choosing in each state the
+    number of dice with the greatest chance of winning.
+
+    >>> table = optimal_table()
+    >>> len(table), table[0], table[7]  # Free Bacon scores 8 at 0 to 7
+    (10000, 4, 0)
+    """
+    chances = [[0.0] * goal for _ in range(goal)]
+    table = array("b", bytes(goal * goal))
+    for score, opponent_score in later_states_first(goal):
+        best_chance, best_num_rolls = -1.0, 0
+        for num_rolls in range(11):
+            chance = turn_win_chance(num_rolls, score, opponent_score, chances, goal)
+            if chance > best_chance:
+                best_chance, best_num_rolls = chance, num_rolls
+        chances[score][opponent_score] = best_chance
+        table[score * goal + opponent_score] = best_num_rolls
+    return table
+
+
+def table_strategy(
+    table: Sequence[int], goal: int = GOAL_SCORE
+) -> Callable[[int, int], int]:
+    """Return a strategy that rolls the number of dice in TABLE, an array
+    indexed as by optimal_table, for each state of a game to GOAL.
+
+    >>> strategy = table_strategy(array("b", [4, 0, 6, 5]), 2)
+    >>> strategy(0, 1), strategy(1, 0)
+    (0, 6)
+    """
+
+    def strategy(score, opponent_score):
+        return table[score * goal + opponent_score]
+
+    return strategy
+
+
+def tabulate(strategy: Callable[[int, int], int], goal: int = GOAL_SCORE) -> array:
+    """Return the number of dice that STRATEGY rolls in each state of a game
+    to GOAL, as an array of signed bytes indexed as by optimal_table.
+
+    >>> table = tabulate(bacon_strategy)
+    >>> len(table), table[0], table[90]
+    (10000, 5, 0)
+    """
+    states = range(goal)
+    return array(
+        "b", [strategy(score, opponent) for score in states for opponent in states]
+    )
+
+
+def nondeterministic_states(
+    strategy: Callable[[int, int], int], goal: int = GOAL_SCORE, trials: int = 2
+) -> List[Tuple[int, int]]:
+    """Return the states (score, opponent_score) of a game to GOAL in which
+    STRATEGY does not return the same number of dice in each of TRIALS calls.
+
+    >>> nondeterministic_states(final_strategy)
+    []
+    >>> calls = []
+    >>> def alternating(score, opponent_score):
+    ...     calls.append(score)
+    ...     return len(calls) % 2 if score == 50 else 4
+    >>> len(nondeterministic_states(alternating)), calls.count(50)
+    (100, 200)
+    """
+    states = []
+    for score in range(goal):
+        for opponent_score in range(goal):
+            num_rolls = strategy(score, opponent_score)
+            for _ in range(trials - 1):
+                if strategy(score, opponent_score) != num_rolls:
+                    states.append((score, opponent_score))
+                    break
+    return states
+
+
+def tabulate_strategy(
+    strategy: Callable[[int, int], int],
+    goal: int = GOAL_SCORE,
+    validate: bool = False,
+) -> Callable[[int, int], int]:
+    """Return a strategy for a game to GOAL that looks up the number of dice
+    that STRATEGY rolls in each state in a table computed once, which is only
+    equivalent if STRATEGY is deterministic.  If VALIDATE, print the states,
+    if any, in which STRATEGY is not.
+
+    >>> tabulated = tabulate_strategy(final_strategy)
+    >>> tabulated(23, 60), tabulated(27, 18), tabulated(12, 12)
+    (0, 6, 6)
+    >>> calls = []
+    >>> def alternating(score, opponent_score):
+    ...     calls.append(score)
+    ...     return len(calls) % 2 if (score, opponent_score) == (50, 7) else 4
+    >>> strategy = tabulate_strategy(alternating, validate=True)
+    Strategy is not deterministic in 1 of 10000 states:
+      score 50 against opponent_score 7
+    """
+    if validate:
+        states = nondeterministic_states(strategy, goal)
+        if states:
+            total = goal * goal
+            print(f"Strategy is not deterministic in {len(states)} of {total} states:")
+            for score, opponent_score in states[:3]:
+                print(f"  score {score} against opponent_score {opponent_score}")
+    return table_strategy(tabulate(strategy, goal), goal)
+
+
+def save_table(table: array, path: str) -> None:
+    """Save TABLE, an array of signed bytes, in the file PATH."""
+    with open(path, "wb") as f:
+        table.tofile(f)
+
+
+def load_table(path: str, goal: int = GOAL_SCORE) -> array:
+    """Return the table for a game to GOAL saved in the file PATH by
+    save_table."""
+    table = array("b")
+    with open(path, "rb") as f:
+        table.frombytes(f.read())
+    assert len(table) == goal * goal, "The table is not for this goal score."
+    return table
 
 
 # Strategies
@@ -346,6 +795,111 @@ def final_strategy(score: int, opponent_score: int) -> int:
         return baseline_roll
 
 
+# Tournament
+
+TOURNAMENT_STRATEGIES = [f"always_roll({n})" for n in range(11)] + [
+    "bacon_strategy",
+    "swap_strategy",
+    "final_strategy",
+]
+
+
+def named_strategy(name: str) -> Callable[[int, int], int]:
+    """Return the strategy called NAME, which is either always_roll(N) or the
+    name of a strategy function in this module.
+
+    >>> named_strategy("always_roll(3)")(0, 0)
+    3
+    >>> named_strategy("bacon_strategy") == bacon_strategy
+    True
+    >>> named_strategy("play")
+    Traceback (most recent call last):
+     ...
+    AssertionError: Unknown strategy: play
+    """
+    if name.startswith("always_roll(") and name.endswith(")"):
+        n = name[len("always_roll(") : -1]
+        assert n.isdigit() and int(n) <= 10, "Unknown strategy: " + name
+        return always_roll(int(n))
+    strategy = globals().get(name)
+    assert callable(strategy), "Unknown strategy: " + name
+    params = list(inspect.signature(strategy).parameters)
+    assert params == ["score", "opponent_score"], "Unknown strategy: " + name
+    return strategy
+
+
+@lru_cache(maxsize=None)
+def tabulated_strategy(name: str) -> Callable[[int, int], int]:
+    """Return the strategy called NAME tabulated by tabulate_strategy, once per
+    process."""
+    return tabulate_strategy(named_strategy(name))
+
+
+def matchup_wins(name0: str, name1: str, games: int, seed: int) -> Tuple[int, int]:
+    """Return the numbers of games that the strategy NAME0 wins against NAME1,
+    of GAMES as Player 0 and of GAMES as Player 1.  The random module is seeded
+    from SEED and both names, so each matchup is reproducible wherever and
+    in whatever order it runs."""
+    random.seed(f"{seed}:{name0}:{name1}")
+    strategy0, strategy1 = tabulated_strategy(name0), tabulated_strategy(name1)
+    wins_as_player_0 = sum(1 - winner(strategy0, strategy1) for _ in range(games))
+    wins_as_player_1 = sum(winner(strategy1, strategy0) for _ in range(games))
+    return wins_as_player_0, wins_as_player_1
+
+
+def tournament(
+    names: Sequence[str] = TOURNAMENT_STRATEGIES,
+    games: int = 1000,
+    seed: int = 0,
+    workers: int | None = None,
+) -> Tuple[List[List[float]], List[List[float]]]:
+    """Play every pair of the strategies called NAMES (see named_strategy)
+    against each other, GAMES times with each as Player 0, and return two
+    matrices: the win rate of each strategy against each other, and the half
+    width of its 95% confidence interval.  Matchups run in parallel in up to
+    WORKERS processes, each seeded from SEED as in matchup_wins.
+    """
+    pairs = [(i, j) for i in range(len(names)) for j in range(i + 1, len(names))]
+    with ProcessPoolExecutor(workers) as executor:
+        results = executor.map(
+            matchup_wins,
+            [names[i] for i, _ in pairs],
+            [names[j] for _, j in pairs],
+            [games] * len(pairs),
+            [seed] * len(pairs),
+        )
+        results = list(results)
+    rates = [[0.5] * len(names) for _ in names]
+    margins = [[0.0] * len(names) for _ in names]
+    for (i, j), (wins_as_player_0, wins_as_player_1) in zip(pairs, results):
+        rate0, rate1 = wins_as_player_0 / games, wins_as_player_1 / games
+        rates[i][j] = (rate0 + rate1) / 2
+        rates[j][i] = 1 - rates[i][j]
+        # The normal approximation of the average of two binomial proportions
+        variance = (rate0 * (1 - rate0) + rate1 * (1 - rate1)) / (4 * games)
+        margins[i][j] = margins[j][i] = 1.96 * variance**0.5
+    return rates, margins
+
+
+def print_tournament(
+    names: Sequence[str], rates: List[List[float]], margins: List[List[float]]
+) -> None:
+    """Print the win rates of a tournament between the strategies called NAMES,
+    followed by their ranking by average win rate against all others."""
+    width = max(len(name) for name in names)
+    print(" " * width, *(f"{k:>5}" for k in range(len(names))))
+    for k, (name, row) in enumerate(zip(names, rates)):
+        print(f"{name:>{width}}", *(f"{rate:5.3f}" for rate in row), f"({k})")
+    print()
+    others = len(names) - 1
+    averages = [(sum(row) - 0.5) / others for row in rates]
+    ranking = sorted(range(len(names)), key=lambda k: averages[k], reverse=True)
+    for place, k in enumerate(ranking, 1):
+        # Independent matchups: the margin of an average adds in quadrature
+        margin = sum(m**2 for m in margins[k]) ** 0.5 / others
+        print(f"{place:>2}. {names[k]:<{width}} {averages[k]:.3f} +/- {margin:.3f}")
+
+
 ##########################
 # Command Line Interface #
 ##########################
@@ -423,6 +977,31 @@ def run(*args: Tuple[Any, ...]) -> None:
     parser.add_argument(
         "--run_experiments", "-r", action="store_true", help="Runs strategy experiments"
     )
+    parser.add_argument(
+        "--batch",
+        "-b",
+        action="store_true",
+        help="Simulate dice in batches with NumPy when running experiments",
+    )
+    parser.add_argument(
+        "--optimal",
+        "-o",
+        metavar="FILE",
+        help="Save the optimal strategy table in FILE and report its win rates",
+    )
+    parser.add_argument(
+        "--tournament",
+        "-t",
+        nargs="*",
+        metavar="STRATEGY",
+        help="Play a tournament between strategies (by default, always_roll(0) "
+        "to always_roll(10), bacon_strategy, swap_strategy and final_strategy)",
+    )
+    parser.add_argument(
+        "--games", type=int, default=1000, help="Games per matchup and side"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Tournament seed")
+    parser.add_argument("--workers", type=int, help="Number of processes")
     parsed_args = parser.parse_args()
 
     if parsed_args.interactive:
@@ -437,4 +1016,28 @@ def run(*args: Tuple[Any, ...]) -> None:
             print("\nQuitting interactive test")
             exit(0)
     elif parsed_args.run_experiments:
-        run_experiments()
+        run_experiments(parsed_args.batch)
+    elif parsed_args.tournament is not None:
+        names = parsed_args.tournament or TOURNAMENT_STRATEGIES
+        if len(names) < 2:
+            print("A tournament needs at least two strategies.")
+            exit(1)
+        for name in names:
+            try:
+                named_strategy(name)
+            except AssertionError as e:
+                print(e)
+                exit(1)
+        rates, margins = tournament(
+            names, parsed_args.games, parsed_args.seed, parsed_args.workers
+        )
+        print_tournament(names, rates, margins)
+    elif parsed_args.optimal:
+        table = optimal_table()
+        save_table(table, parsed_args.optimal)
+        strategy = table_strategy(load_table(parsed_args.optimal))
+        print("optimal strategy exact win rate:", exact_win_rate(strategy))
+        print(
+            "optimal strategy exact win rate against final_strategy:",
+            exact_win_rate(strategy, final_strategy),
+        )
@@ -1,5 +1,6 @@
 """The buffer module assists in iterating through lines and tokens."""
 
+import collections
 import math
 
 class Buffer:
@@ -16,8 +17,10 @@ class Buffer:
     In addition, Buffer provides a current method to look at the
     next item to be supplied, without sequencing past it.
 
-    The __str__ method prints all tokens read so far, up to the end of the
-    current line, and marks the current token with >>.
+    The __str__ method prints the tokens of the last few lines read, up to the
+    end of the current line, and marks the current token with >>.  Only
+    RECENT_LINES lines are kept, so a Buffer over a long source uses constant
+    memory.
 
     >>> buf = Buffer(iter([['(', '+'], [15], [12, ')']]))
     >>> buf.pop()
@@ -47,9 +50,12 @@ class Buffer:
     3: 12 ) >>
     >>> buf.pop()  # returns None
     """
+    RECENT_LINES = 4
+
     def __init__(self, source):
         self.index = 0
-        self.lines = []
+        self.lines = collections.deque(maxlen=self.RECENT_LINES)
+        self.line_count = 0
         self.source = source
         self.current_line = ()
         self.current()
@@ -72,6 +78,7 @@ class Buffer:
             try:
                 self.current_line = next(self.source)
                 self.lines.append(self.current_line)
+                self.line_count += 1
             except StopIteration:
                 self.current_line = ()
                 return None
@@ -80,13 +87,14 @@ class Buffer:
     def __str__(self):
         """Return recently read contents; current element marked with >>."""
         # Format string for right-justified line numbers
-        n = len(self.lines)
+        n = self.line_count
         msg = '{0:>' + str(math.floor(math.log10(n))+1) + "}: "
 
         # Up to three previous lines and current line are included in output
         s = ''
-        for i in range(max(0, n-4), n-1):
-            s += msg.format(i+1) + ' '.join(map(str, self.lines[i])) + '\n'
+        first = n - len(self.lines) # The number of lines no longer kept
+        for i in range(first, n-1):
+            s += msg.format(i+1) + ' '.join(map(str, self.lines[i-first])) + '\n'
         s += msg.format(n)
         s += ' '.join(map(str, self.current_line[:self.index]))
         s += ' >> '
@@ -110,15 +118,29 @@ class InputReader:
             self.prompt = ' ' * len(self.prompt)
 
 class LineReader:
-    """A LineReader is an iterable that prints lines after a prompt."""
+    """A LineReader is an iterable that prints lines after a prompt.
+
+    LINES is an iterator, such as an open file, or a list.  Lines are consumed
+    as they are read, so a later LineReader over the same LINES continues
+    where this one stopped.  Removing each line from the front of a list takes
+    time proportional to its length, so long sources should be iterators.
+    """
     def __init__(self, lines, prompt, comment=";"):
         self.lines = lines
         self.prompt = prompt
         self.comment = comment
 
+    def _source(self):
+        if isinstance(self.lines, list):
+            while self.lines:
+                yield self.lines.pop(0)
+        else:
+            for line in self.lines: # Unlike yield from, never closes LINES
+                yield line
+
     def __iter__(self):
-        while self.lines:
-            line = self.lines.pop(0).strip('\n')
+        for line in self._source():
+            line = line.strip('\n')
             if (self.prompt is not None and line != "" and
                 not line.lstrip().startswith(self.comment)):
                 print(self.prompt + line)
@@ -2,6 +2,11 @@
 eval/apply mutual recurrence, environment model, and read-eval-print loop.
 """
 
+import collections
+import os
+import pickle
+import sys
+import time
 from scheme_primitives import *
 from scheme_reader import *
 from ucb import main, trace
@@ -36,7 +41,10 @@ def scheme_eval(expr, env):
     # Evaluate Combinations
     if (scheme_symbolp(first) # first might be unhashable
         and first in LOGIC_FORMS):
-        return scheme_eval(LOGIC_FORMS[first](rest, env), env)
+        expr, tail_env = LOGIC_FORMS[first](rest, env)
+        if tail_env is None: # The form computed its value
+            return expr
+        return scheme_eval(expr, tail_env)
     elif first == "lambda":
         return do_lambda_form(rest, env)
     elif first == "mu":
@@ -69,6 +77,7 @@ def scheme_apply(procedure, args, env):
 
 def apply_primitive(procedure, args, env):
     """Apply PrimitiveProcedure PROCEDURE to a Scheme list of ARGS in ENV.
+    ARGS may also be a Python list.
 
     >>> env = create_global_frame()
     >>> plus = env.bindings["+"]
@@ -76,7 +85,15 @@ def apply_primitive(procedure, args, env):
     >>> apply_primitive(plus, twos, env)
     4
     """
+    if type(args) is not list:
+        args = list(args)
+    num_args = len(args)
     try:
+        if num_args == procedure.fast_arity:
+            return procedure.fast(*args)
+        if num_args < procedure.min_args or (procedure.max_args is not None
+                                             and num_args > procedure.max_args):
+            raise SchemeError(f"Procedure {str(procedure)} called with {num_args} arguments")
         if procedure.use_env:
             return procedure.fn(*args, env)
         else:
@@ -106,13 +123,14 @@ class Frame:
     def lookup(self, symbol):
         """Return the value bound to SYMBOL.  Errors if SYMBOL is not found."""
         frame = self
-        while frame and symbol not in frame.bindings.keys():
+        while frame is not None:
+            bindings = frame.bindings
+            if symbol in bindings:
+                return bindings[symbol]
             frame = frame.parent
 
-        if not frame: # symbol not found in any frame
-            raise SchemeError("unknown identifier: {0}".format(str(symbol)))
-
-        return frame.bindings[symbol]
+        # symbol not found in any frame
+        raise SchemeError("unknown identifier: {0}".format(str(symbol)))
 
     def global_frame(self):
         """The global environment at the root of the parent chain."""
@@ -145,6 +163,46 @@ class Frame:
         """Define Scheme symbol SYM to have value VAL in SELF."""
         self.bindings[sym] = val
 
+_UNBOUND = object() # The value of a slot whose symbol is not yet defined
+
+class ArrayFrame(Frame):
+    """A frame that stores the value of each symbol in NAMES, a tuple, in the
+    list SLOTS at the same position.  Analyzed expressions with lexical
+    addresses access SLOTS by index.  Any other symbol defined in the frame
+    (for example, by eval) is kept in a dictionary.
+
+    >>> frame = ArrayFrame(create_global_frame(), ('a', 'b'), [1, _UNBOUND])
+    >>> frame.define('c', 3)
+    >>> frame
+    <{a: 1, c: 3} -> <Global Frame>>
+    >>> frame.define('b', 2)
+    >>> frame.slots
+    [1, 2]
+    """
+
+    def __init__(self, parent, names, slots):
+        self.parent = parent
+        self.names = names
+        self.slots = slots
+        self.extra = None
+
+    @property
+    def bindings(self):
+        """A dictionary of the symbols bound in SELF."""
+        bindings = {name: val for name, val in zip(self.names, self.slots)
+                    if val is not _UNBOUND}
+        if self.extra:
+            bindings.update(self.extra)
+        return bindings
+
+    def define(self, sym, val):
+        if sym in self.names:
+            self.slots[self.names.index(sym)] = val
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[sym] = val
+
 class LambdaProcedure:
     """A procedure defined by a lambda expression or the complex define form."""
 
@@ -157,6 +215,12 @@ class LambdaProcedure:
         self.formals = formals
         self.body = body
         self.env = env
+        self.analyzed = None
+        self.compiled = None
+
+    def __getstate__(self):
+        # Analyzed and compiled bodies are not saved, but rebuilt when needed
+        return dict(self.__dict__, analyzed=None, compiled=None)
 
     def __str__(self):
         return "(lambda {0} {1})".format(str(self.formals), str(self.body))
@@ -184,6 +248,12 @@ class MuProcedure:
         can be handled by using (begin (display x) (+ x 1)) as the body."""
         self.formals = formals
         self.body = body
+        self.analyzed = None
+        self.compiled = None
+
+    def __getstate__(self):
+        # Analyzed and compiled bodies are not saved, but rebuilt when needed
+        return dict(self.__dict__, analyzed=None, compiled=None)
 
     def __str__(self):
         return "(mu {0} {1})".format(str(self.formals), str(self.body))
@@ -270,28 +340,40 @@ def do_let_form(vals, env):
 # Logical Special Forms #
 #########################
 
+# Each logical special form returns a pair (expr, env).  If ENV is an
+# environment, the value of the form is that of EXPR in ENV, which remains to
+# be evaluated in tail position.  If ENV is None, EXPR is the value of the
+# form, already computed, which must not be evaluated again.
+
 def do_if_form(vals, env):
     """Evaluate if form with parameters VALS in environment ENV."""
     check_form(vals, 2, 3)
     try:
         if scheme_true(scheme_eval(vals[0], env)):
-            return vals[1]
+            return vals[1], env
         elif len(vals) > 2:
-            return vals[2]
+            return vals[2], env
     except TypeError:
-        return 
-    return okay
+        return None, env
+    return okay, None
 
 def do_and_form(vals, env):
-    """Evaluate short-circuited and with parameters VALS in environment ENV."""
-    if len(vals) == 0:
-        return True
-    while vals != nil:
-        cond = scheme_eval(vals.first, env)
-        if scheme_false(cond):
-            return cond
+    """Evaluate short-circuited and with parameters VALS in environment ENV.
+
+    >>> env = create_global_frame()
+    >>> do_and_form(read_line("(1 'x (car '(y)))"), env)
+    (Pair('car', Pair(Pair('quote', Pair(Pair('y', nil), nil)), nil)), <Global Frame>)
+    >>> do_and_form(read_line("(1 #f 'x)"), env)
+    (False, None)
+    """
+    if vals is nil:
+        return True, None
+    while vals.second is not nil:
+        value = scheme_eval(vals.first, env)
+        if scheme_false(value):
+            return value, None
         vals = vals.second
-    return cond
+    return vals.first, env
 
 def quote(value):
     """Return a Scheme expression quoting the Scheme VALUE.
@@ -306,22 +388,22 @@ def quote(value):
 
 def do_or_form(vals, env):
     """Evaluate short-circuited or with parameters VALS in environment ENV."""
-    if len(vals) == 0:
-        return False
-    while vals != nil:
-        cond = scheme_eval(vals.first, env)
-        if not scheme_false(cond):
-            return quote(cond)
+    if vals is nil:
+        return False, None
+    while vals.second is not nil:
+        value = scheme_eval(vals.first, env)
+        if scheme_true(value):
+            return value, None
         vals = vals.second
-    return cond
+    return vals.first, env
 
 def do_cond_form(vals, env):
     """Evaluate cond form with parameters VALS in environment ENV."""
-    num_clauses = len(vals)
-    for i, clause in enumerate(vals):
+    while vals is not nil:
+        clause = vals.first
         check_form(clause, 1)
         if clause.first == "else":
-            if i < num_clauses-1:
+            if vals.second is not nil:
                 raise SchemeError("else must be last")
             test = True
             if clause.second is nil:
@@ -329,22 +411,22 @@ def do_cond_form(vals, env):
         else:
             test = scheme_eval(clause.first, env)
         if scheme_true(test):
-            if len(clause.second) > 1:
-                return do_begin_form(clause.second, env)
-            elif len(clause.second) != 0:
-                return clause.second[0]
-            else:
-                return clause.first
-
-    return okay
+            body = clause.second
+            if body is nil:
+                return test, None
+            elif body.second is nil:
+                return body.first, env
+            return do_begin_form(body, env)
+        vals = vals.second
+    return okay, None
 
 def do_begin_form(vals, env):
     """Evaluate begin form with parameters VALS in environment ENV."""
     check_form(vals, 1)
-    while vals.second != nil:
+    while vals.second is not nil:
         scheme_eval(vals.first, env)
         vals = vals.second
-    return vals.first
+    return vals.first, env
 
 LOGIC_FORMS = {
         "and": do_and_form,
@@ -375,7 +457,7 @@ def check_formals(formals):
 
     >>> check_formals(read_line("(a b c)"))
     """
-    formal_list = [formals[i] for i in range(len(formals))]
+    formal_list = list(formals)
     for f in formal_list:
         if not scheme_symbolp(f):
             raise SchemeError(f"Formal parameters is not a well-formed list of symbols")
@@ -406,7 +488,9 @@ def scheme_optimized_eval(expr, env):
         # Evaluate Combinations
         if (scheme_symbolp(first) # first might be unhashable
             and first in LOGIC_FORMS):
-            expr = LOGIC_FORMS[first](rest, env)
+            expr, env = LOGIC_FORMS[first](rest, env)
+            if env is None: # The form computed its value
+                return expr
             continue
         elif first == "lambda":
             return do_lambda_form(rest, env)
@@ -439,6 +523,1419 @@ def scheme_optimized_eval(expr, env):
 scheme_eval = scheme_optimized_eval
 
 
+############
+# Analysis #
+############
+
+# The analyzing evaluator converts each expression into a Python function of
+# one argument, an environment, exactly once.  Syntax is examined only during
+# analysis, so repeatedly running a procedure body skips all dispatch on the
+# form of its expressions.
+
+class TailCall:
+    """A procedure body NODE that remains to be run in environment ENV.
+
+    Analyzed expressions in tail position return a TailCall instead of running
+    the body of the procedure they call, which keeps tail calls from growing
+    the Python stack."""
+
+    __slots__ = ('node', 'env')
+
+    def __init__(self, node, env):
+        self.node = node
+        self.env = env
+
+def run_node(node, env):
+    """Run analyzed expression NODE in ENV, completing any tail calls."""
+    result = node(env)
+    while type(result) is TailCall:
+        result = result.node(result.env)
+    return result
+
+class AnalyzedBody:
+    """The analyzed body NODE of a procedure with FORMALS, a tuple of symbols.
+    The bytecode engine stores the Bytecode of the body as NODE.  If NAMES is
+    a tuple, which begins with FORMALS, calls bind NAMES to the slots of an
+    ArrayFrame."""
+
+    __slots__ = ('formals', 'node', 'names', 'padding')
+
+    def __init__(self, formals, node, names=None):
+        self.formals = formals
+        self.node = node
+        self.names = names
+        if names is not None:
+            self.padding = [_UNBOUND] * (len(names) - len(formals))
+
+    def make_frame(self, parent, args):
+        """Return a new frame whose parent is PARENT, binding the formal
+        parameters to ARGS, a Python list of values."""
+        if len(args) != len(self.formals):
+            raise SchemeError("Number of formal parameters do not match number of arguments")
+        if self.names is not None:
+            if self.padding:
+                args = args + self.padding
+            return ArrayFrame(parent, self.names, args)
+        frame = Frame(parent)
+        frame.bindings = dict(zip(self.formals, args))
+        return frame
+
+class Scope:
+    """The symbols bound in a frame at analysis time.  A Scope with NAMES, a
+    tuple, describes an ArrayFrame whose parent is described by PARENT.  A
+    Scope whose NAMES is None describes a frame whose bindings are unknown,
+    which is looked up by name."""
+
+    __slots__ = ('names', 'parent')
+
+    def __init__(self, names, parent=None):
+        self.names = names
+        self.parent = parent
+
+    def slot(self, symbol):
+        """The index of the slot for SYMBOL in this frame, or None."""
+        if self.names is not None and symbol in self.names:
+            return self.names.index(symbol)
+
+    def resolve(self, symbol):
+        """Return the lexical address (depth, index) of SYMBOL.  If SYMBOL is
+        not in any ArrayFrame, index is None and depth is the number of
+        frames to skip before looking it up by name.
+
+        >>> scope = Scope(('x', 'y'), Scope(('f', 'x'), Scope(None)))
+        >>> scope.resolve('y'), scope.resolve('f'), scope.resolve('+')
+        ((0, 1), (1, 0), (2, None))
+        """
+        depth, scope = 0, self
+        while scope.names is not None:
+            if symbol in scope.names:
+                return depth, scope.names.index(symbol)
+            depth, scope = depth + 1, scope.parent
+        return depth, None
+
+def scheme_analyze(expr, tail=False, scope=None):
+    """Return a function that evaluates Scheme expression EXPR in the
+    environment it is passed.  If TAIL, calls to compound procedures return a
+    TailCall to be completed by run_node.  If SCOPE is a Scope, variables are
+    resolved to lexical addresses in the frames described by SCOPE.
+
+    Malformed special forms are reported when the analyzed expression is run,
+    not during analysis, so that unevaluated code behaves as in scheme_eval.
+
+    >>> node = scheme_analyze(read_line("(* 2 (+ 3 4))"))
+    >>> node(create_global_frame())
+    14
+    >>> node = scheme_analyze(read_line("(lambda (x x) x)")) # Not run
+    """
+    try:
+        return _analyze(expr, tail, scope)
+    except SchemeError as err:
+        return analyze_error(err)
+
+def analyze_symbol(symbol, scope):
+    """Analyze a variable reference to SYMBOL in SCOPE."""
+    if scope is None:
+        return lambda env: env.lookup(symbol)
+    depth, index = scope.resolve(symbol)
+    if index is None:
+        if depth == 0:
+            return lambda env: env.lookup(symbol)
+        if depth == 1:
+            def enclosing(env):
+                if env.extra and symbol in env.extra:
+                    return env.extra[symbol]
+                return env.parent.lookup(symbol)
+            return enclosing
+        def lookup(env):
+            for _ in range(depth): # Symbols defined by eval are in extra
+                if env.extra and symbol in env.extra:
+                    return env.extra[symbol]
+                env = env.parent
+            return env.lookup(symbol)
+        return lookup
+    if depth == 0:
+        def local(env):
+            value = env.slots[index]
+            if value is _UNBOUND:
+                return env.parent.lookup(symbol)
+            return value
+        return local
+    def lexical(env):
+        for _ in range(depth): # Symbols defined by eval are in extra
+            if env.extra and symbol in env.extra:
+                return env.extra[symbol]
+            env = env.parent
+        value = env.slots[index]
+        if value is _UNBOUND:
+            return env.parent.lookup(symbol)
+        return value
+    return lexical
+
+def defined_names(expr):
+    """Return a list of the symbols that evaluating EXPR may define in the
+    current frame, excluding those defined in any nested frame.
+
+    >>> defined_names(read_line("(begin (define x 1) (define (f) (define y 2)))"))
+    ['x', 'f']
+    """
+    names = []
+    exprs = [expr]
+    for expr in exprs: # Visits subexpressions appended during the loop
+        if not isinstance(expr, Pair):
+            continue
+        first, rest = expr.first, expr.second
+        if first in ("quote", "lambda", "mu"):
+            continue
+        elif first == "define" and isinstance(rest, Pair):
+            if isinstance(rest.first, Pair): # (define (f ...) ...)
+                names.append(rest.first.first)
+                continue
+            names.append(rest.first)
+            rest = rest.second
+        elif first == "let" and isinstance(rest, Pair):
+            bindings, rest = rest.first, nil # The let body is nested
+            while isinstance(bindings, Pair):
+                binding = bindings.first
+                if isinstance(binding, Pair) and isinstance(binding.second, Pair):
+                    exprs.append(binding.second.first)
+                bindings = bindings.second
+        else:
+            rest = expr
+        while isinstance(rest, Pair):
+            exprs.append(rest.first)
+            rest = rest.second
+    return [name for name in names if scheme_symbolp(name)]
+
+def analyze_error(err):
+    """Return an analyzed expression that raises SchemeError ERR when run."""
+    args = err.args
+    def fail(env):
+        raise SchemeError(*args)
+    return fail
+
+def _analyze(expr, tail, scope):
+    if expr is None:
+        raise SchemeError("Cannot evaluate an undefined expression.")
+
+    # Analyze Atoms
+    if scheme_symbolp(expr):
+        return analyze_symbol(expr, scope)
+    elif scheme_atomp(expr) or scheme_stringp(expr) or expr is okay:
+        return lambda env: expr
+
+    # All non-atomic expressions are lists.
+    if not scheme_listp(expr):
+        raise SchemeError("malformed list: {0}".format(str(expr)))
+    first, rest = expr.first, expr.second
+
+    # Analyze Combinations
+    if scheme_symbolp(first) and first in ANALYZED_FORMS:
+        return ANALYZED_FORMS[first](rest, tail, scope)
+    else:
+        return analyze_combination(first, rest, tail, scope)
+
+def analyze_sequence(exprs, tail, scope):
+    """Analyze a non-empty Scheme list of EXPRS evaluated in order, returning
+    the value of the last."""
+    items = _scheme_items(exprs)
+    init = [scheme_analyze(e, False, scope) for e in items[:-1]]
+    last = scheme_analyze(items[-1], tail, scope)
+    if not init:
+        return last
+    def sequence(env):
+        for node in init:
+            node(env)
+        return last(env)
+    return sequence
+
+def analyze_body(formals, body, scope=None):
+    """Analyze BODY, a single expression, as the body of a procedure with
+    Scheme list FORMALS that is called in the frame described by SCOPE.  If
+    SCOPE is a Scope, calls bind the formals and every symbol defined in the
+    body to slots of an ArrayFrame."""
+    formals = formal_names(formals)
+    if scope is None:
+        return AnalyzedBody(formals, scheme_analyze(body, True))
+    names = frame_names(formals, body)
+    node = scheme_analyze(body, True, Scope(names, scope))
+    return AnalyzedBody(formals, node, names)
+
+def formal_names(formals):
+    """Return a tuple of the symbols in FORMALS, after checking that FORMALS
+    is a valid parameter list.
+
+    >>> formal_names(read_line("(a b)"))
+    ('a', 'b')
+    """
+    if not scheme_listp(formals):
+        raise SchemeError("Formal parameters is not a well-formed list of symbols")
+    check_formals(formals)
+    return tuple(_scheme_items(formals))
+
+def frame_names(formals, body):
+    """Return a tuple of the symbols bound in a call frame of a procedure with
+    a tuple of FORMALS and BODY: the formals followed by each symbol that the
+    body may define."""
+    names = list(formals)
+    for name in defined_names(body):
+        if name not in names:
+            names.append(name)
+    return tuple(names)
+
+def analyze_lambda_form(vals, tail, scope):
+    check_form(vals, 2)
+    formals = vals[0]
+    body = Pair("begin", vals.second) if len(vals) > 2 else vals[1]
+    analyzed = analyze_body(formals, body, scope)
+    def make_lambda(env):
+        procedure = LambdaProcedure(formals, body, env)
+        procedure.analyzed = analyzed
+        return procedure
+    return make_lambda
+
+def analyze_mu_form(vals, tail, scope):
+    check_form(vals, 2)
+    formals = vals[0]
+    body = Pair("begin", vals.second) if len(vals) > 2 else vals[1]
+    if scope is None:
+        analyzed = analyze_body(formals, body)
+    else: # The parent of a mu frame is unknown until it is called
+        node = scheme_analyze(body, True, Scope(None))
+        analyzed = AnalyzedBody(formal_names(formals), node)
+    def make_mu(env):
+        procedure = MuProcedure(formals, body)
+        procedure.analyzed = analyzed
+        return procedure
+    return make_mu
+
+def analyze_define_form(vals, tail, scope):
+    check_form(vals, 2)
+    target = vals[0]
+    if scheme_symbolp(target):
+        check_form(vals, 2, 2)
+        value = scheme_analyze(vals[1], False, scope)
+        index = None if scope is None else scope.slot(target)
+        if index is not None:
+            def define_slot(env):
+                env.slots[index] = value(env)
+                return target
+            return define_slot
+        def define(env):
+            env.define(target, value(env))
+            return target
+        return define
+    elif isinstance(target, Pair) and scheme_symbolp(target.first):
+        name = target.first
+        lambda_vals = Pair(target.second, vals.second)
+        make_lambda = analyze_lambda_form(lambda_vals, False, scope)
+        def define_procedure(env):
+            env.define(name, make_lambda(env))
+            return name
+        return define_procedure
+    else:
+        raise SchemeError("bad argument to define")
+
+def analyze_quote_form(vals, tail, scope):
+    check_form(vals, 1, 1)
+    value = vals.first
+    return lambda env: value
+
+def analyze_let_form(vals, tail, scope):
+    check_form(vals, 2)
+    bindings = vals[0]
+    if not scheme_listp(bindings):
+        raise SchemeError("bad bindings list in let form")
+    names, values = [], []
+    for binding in _scheme_items(bindings):
+        check_form(binding, 2, 2)
+        names.append(binding.first)
+        values.append(scheme_analyze(binding[1], False, scope))
+    body = Pair("begin", vals.second)
+    analyzed = analyze_body(scheme_list(*names), body, scope)
+    def let(env):
+        frame = analyzed.make_frame(env, [value(env) for value in values])
+        if tail:
+            return analyzed.node(frame)
+        return run_node(analyzed.node, frame)
+    return let
+
+def analyze_if_form(vals, tail, scope):
+    check_form(vals, 2, 3)
+    predicate = scheme_analyze(vals[0], False, scope)
+    consequent = scheme_analyze(vals[1], tail, scope)
+    if len(vals) > 2:
+        alternative = scheme_analyze(vals[2], tail, scope)
+    else:
+        alternative = lambda env: okay
+    def if_(env):
+        if scheme_true(predicate(env)):
+            return consequent(env)
+        return alternative(env)
+    return if_
+
+def analyze_and_form(vals, tail, scope):
+    if vals is nil:
+        return lambda env: True
+    items = _scheme_items(vals)
+    init = [scheme_analyze(e, False, scope) for e in items[:-1]]
+    last = scheme_analyze(items[-1], tail, scope)
+    def and_(env):
+        for node in init:
+            value = node(env)
+            if scheme_false(value):
+                return value
+        return last(env)
+    return and_
+
+def analyze_or_form(vals, tail, scope):
+    if vals is nil:
+        return lambda env: False
+    items = _scheme_items(vals)
+    init = [scheme_analyze(e, False, scope) for e in items[:-1]]
+    last = scheme_analyze(items[-1], tail, scope)
+    def or_(env):
+        for node in init:
+            value = node(env)
+            if not scheme_false(value):
+                return value
+        return last(env)
+    return or_
+
+def analyze_cond_clause(clause, is_last, tail, scope):
+    """Return a pair of analyzed expressions for the test and the body of a
+    cond CLAUSE.  The test is None for an else clause and the body is None
+    when the clause has no body."""
+    check_form(clause, 1)
+    if clause.first == "else":
+        if not is_last:
+            raise SchemeError("else must be last")
+        if clause.second is nil:
+            raise SchemeError("badly formed else clause")
+        test = None
+    else:
+        test = scheme_analyze(clause.first, False, scope)
+    if clause.second is nil:
+        return test, None
+    return test, analyze_sequence(clause.second, tail, scope)
+
+def analyze_cond_form(vals, tail, scope):
+    clauses = []
+    items = _scheme_items(vals)
+    for i, clause in enumerate(items):
+        try:
+            is_last = i == len(items)-1
+            clauses.append(analyze_cond_clause(clause, is_last, tail, scope))
+        except SchemeError as err:
+            clauses.append((analyze_error(err), None)) # Raises when reached
+            break
+    def cond(env):
+        for test, body in clauses:
+            value = True if test is None else test(env)
+            if scheme_true(value):
+                return value if body is None else body(env)
+        return okay
+    return cond
+
+def analyze_begin_form(vals, tail, scope):
+    check_form(vals, 1)
+    return analyze_sequence(vals, tail, scope)
+
+def analyze_combination(first, rest, tail, scope):
+    operator = scheme_analyze(first, False, scope)
+    operands = [scheme_analyze(e, False, scope) for e in _scheme_items(rest)]
+    def combination(env):
+        procedure = operator(env)
+        args = [operand(env) for operand in operands]
+        if isinstance(procedure, LambdaProcedure):
+            analyzed = procedure_analysis(procedure)
+            frame = analyzed.make_frame(procedure.env, args)
+        elif isinstance(procedure, MuProcedure):
+            analyzed = procedure_analysis(procedure)
+            frame = analyzed.make_frame(env, args)
+        elif isinstance(procedure, PrimitiveProcedure):
+            return apply_primitive(procedure, args, env)
+        else:
+            raise SchemeError("Cannot call {0}".format(str(procedure)))
+        if tail:
+            return TailCall(analyzed.node, frame)
+        return run_node(analyzed.node, frame)
+    return combination
+
+def procedure_analysis(procedure):
+    """Return the AnalyzedBody of a LambdaProcedure or MuProcedure, analyzing
+    it first if it was created by another evaluator."""
+    if procedure.analyzed is None:
+        procedure.analyzed = analyze_body(procedure.formals, procedure.body)
+    return procedure.analyzed
+
+def _scheme_items(s):
+    """Return the elements of well-formed Scheme list S as a Python list."""
+    items = []
+    while s is not nil:
+        items.append(s.first)
+        s = s.second
+    return items
+
+ANALYZED_FORMS = {
+        "and": analyze_and_form,
+        "or": analyze_or_form,
+        "if": analyze_if_form,
+        "cond": analyze_cond_form,
+        "begin": analyze_begin_form,
+        "lambda": analyze_lambda_form,
+        "mu": analyze_mu_form,
+        "define": analyze_define_form,
+        "quote": analyze_quote_form,
+        "let": analyze_let_form,
+        }
+
+def scheme_analyzed_eval(expr, env):
+    """Evaluate Scheme expression EXPR in environment ENV by analyzing it.
+
+    >>> expr = read_line("((lambda (x) (* x x)) 12)")
+    >>> scheme_analyzed_eval(expr, create_global_frame())
+    144
+    """
+    return run_node(scheme_analyze(expr, True), env)
+
+def scheme_lexical_eval(expr, env):
+    """Evaluate Scheme expression EXPR in environment ENV by analyzing it and
+    resolving variables in procedure bodies to lexical addresses.
+
+    >>> expr = read_line("(((lambda (x) (lambda (y) (+ x y))) 3) 4)")
+    >>> scheme_lexical_eval(expr, create_global_frame())
+    7
+    """
+    return run_node(scheme_analyze(expr, True, Scope(None)), env)
+
+def scheme_analyzed_apply(procedure, args, env):
+    """Apply Scheme PROCEDURE to argument values ARGS in environment ENV,
+    running the analyzed body of compound procedures."""
+    args = _scheme_items(args)
+    if isinstance(procedure, PrimitiveProcedure):
+        return apply_primitive(procedure, args, env)
+    elif isinstance(procedure, LambdaProcedure):
+        analyzed = procedure_analysis(procedure)
+        return run_node(analyzed.node, analyzed.make_frame(procedure.env, args))
+    elif isinstance(procedure, MuProcedure):
+        analyzed = procedure_analysis(procedure)
+        return run_node(analyzed.node, analyzed.make_frame(env, args))
+    else:
+        raise SchemeError("Cannot call {0}".format(str(procedure)))
+
+
+#################
+# Continuations #
+#################
+
+# The continuation machine evaluates Scheme expressions with an explicit stack
+# of continuation frames instead of the Python call stack, so neither operand
+# evaluation nor deep non-tail recursion is bounded by the recursion limit.
+# Each continuation frame is a list whose first element names the work that
+# remains once the value of the current expression is known.
+
+def scheme_machine_eval(expr, env):
+    """Evaluate Scheme expression EXPR in environment ENV using an explicit
+    continuation stack.
+
+    >>> env = create_global_frame()
+    >>> expr = read_line("(define (count n) (if (= n 0) 0 (+ 1 (count (- n 1)))))")
+    >>> scheme_machine_eval(expr, env)
+    'count'
+    >>> scheme_machine_eval(read_line("(count 5000)"), env)
+    5000
+    """
+    stack = []
+    while True:
+        # Evaluate EXPR in ENV, either computing its VALUE or pushing a
+        # continuation frame and evaluating a subexpression
+        if expr is None:
+            raise SchemeError("Cannot evaluate an undefined expression.")
+        if scheme_symbolp(expr):
+            value = env.lookup(expr)
+        elif scheme_atomp(expr) or scheme_stringp(expr) or expr is okay:
+            value = expr
+        elif not scheme_listp(expr):
+            raise SchemeError("malformed list: {0}".format(str(expr)))
+        else:
+            first, rest = expr.first, expr.second
+            if not scheme_symbolp(first) or first not in MACHINE_FORMS:
+                stack.append(["operator", rest, env])
+                expr = first
+                continue
+            elif first == "quote":
+                value = do_quote_form(rest)
+            elif first == "lambda":
+                value = do_lambda_form(rest, env)
+            elif first == "mu":
+                value = do_mu_form(rest)
+            elif first == "define":
+                check_form(rest, 2)
+                if not scheme_symbolp(rest.first):
+                    value = do_define_form(rest, env) # Evaluates nothing
+                else:
+                    check_form(rest, 2, 2)
+                    stack.append(["define", rest.first, env])
+                    expr = rest.second.first
+                    continue
+            elif first == "if":
+                check_form(rest, 2, 3)
+                stack.append(["if", rest.second, env])
+                expr = rest.first
+                continue
+            elif first == "and" or first == "or":
+                if rest is nil:
+                    value = first == "and"
+                else:
+                    if rest.second is not nil:
+                        stack.append([first, rest.second, env])
+                    expr = rest.first
+                    continue
+            elif first == "begin":
+                check_form(rest, 1)
+                if rest.second is not nil:
+                    stack.append(["begin", rest.second, env])
+                expr = rest.first
+                continue
+            elif first == "cond":
+                stack.append(["cond", None, rest, env])
+                value = False # Proceed to the first clause
+            elif first == "let":
+                check_form(rest, 2)
+                if not scheme_listp(rest.first):
+                    raise SchemeError("bad bindings list in let form")
+                stack.append(["let", rest.first, nil, None, rest.second, env])
+                value = None # Proceed to the first binding
+
+        # Pass VALUE to continuation frames until one of them needs another
+        # expression evaluated
+        while stack:
+            frame = stack.pop()
+            kind = frame[0]
+            if kind == "operator" or kind == "operand":
+                if kind == "operator":
+                    procedure, args, operands, env = value, [], frame[1], frame[2]
+                else:
+                    procedure, args, operands, env = frame[1], frame[2], frame[3], frame[4]
+                    args.append(value)
+                if operands is not nil:
+                    stack.append(["operand", procedure, args, operands.second, env])
+                    expr = operands.first
+                    break
+                if isinstance(procedure, LambdaProcedure):
+                    env = procedure.env.make_call_frame(procedure.formals,
+                                                        scheme_list(*args))
+                elif isinstance(procedure, MuProcedure):
+                    env = env.make_call_frame(procedure.formals,
+                                              scheme_list(*args))
+                elif isinstance(procedure, PrimitiveProcedure):
+                    value = apply_primitive(procedure, args, env)
+                    continue
+                else:
+                    raise SchemeError("Cannot call {0}".format(str(procedure)))
+                expr = procedure.body
+                break
+            elif kind == "define":
+                frame[2].define(frame[1], value)
+                value = frame[1]
+            elif kind == "if":
+                branches, env = frame[1], frame[2]
+                if scheme_true(value):
+                    expr = branches.first
+                    break
+                elif branches.second is not nil:
+                    expr = branches.second.first
+                    break
+                value = okay
+            elif kind == "and" or kind == "or":
+                if scheme_false(value) == (kind == "and"):
+                    continue # The value of the whole form
+                exprs, env = frame[1], frame[2]
+                if exprs.second is not nil:
+                    stack.append([kind, exprs.second, env])
+                expr = exprs.first
+                break
+            elif kind == "begin":
+                exprs, env = frame[1], frame[2]
+                if exprs.second is not nil:
+                    stack.append(["begin", exprs.second, env])
+                expr = exprs.first
+                break
+            elif kind == "cond":
+                clause, clauses, env = frame[1], frame[2], frame[3]
+                if clause is None or scheme_false(value):
+                    if clauses is nil:
+                        value = okay
+                        continue
+                    clause, clauses = clauses.first, clauses.second
+                    check_form(clause, 1)
+                    if clause.first != "else":
+                        stack.append(["cond", clause, clauses, env])
+                        expr = clause.first
+                        break
+                    if clauses is not nil:
+                        raise SchemeError("else must be last")
+                    if clause.second is nil:
+                        raise SchemeError("badly formed else clause")
+                body = clause.second
+                if body is nil:
+                    continue # The value of the test
+                if body.second is not nil:
+                    stack.append(["begin", body.second, env])
+                expr = body.first
+                break
+            elif kind == "let":
+                bindings, names, values, body, env = frame[1:]
+                if values is None:
+                    values = nil
+                else: # VALUE is the value of the previous binding
+                    values = Pair(value, values)
+                if bindings is not nil:
+                    binding = bindings.first
+                    check_form(binding, 2, 2)
+                    names = Pair(binding.first, names)
+                    stack.append(["let", bindings.second, names, values, body, env])
+                    expr = binding.second.first
+                    break
+                env = env.make_call_frame(names, values)
+                if body.second is not nil:
+                    stack.append(["begin", body.second, env])
+                expr = body.first
+                break
+        else:
+            return value
+
+MACHINE_FORMS = {"quote", "lambda", "mu", "define", "if", "and", "or", "begin",
+                 "cond", "let"}
+
+
+############
+# Bytecode #
+############
+
+# The bytecode engine compiles each expression into a flat list of integers,
+# in which every opcode is followed by its operands, and runs it on a stack
+# machine.  Variables are resolved to lexical addresses as in the lexical
+# engine.  Calls push return addresses on a Python list rather than the
+# Python stack, and calls in tail position reuse the current one.
+
+(OP_CONST, OP_LOCAL, OP_LEXICAL, OP_NAME, OP_DEFINE, OP_DEFINE_LOCAL, OP_POP,
+ OP_JUMP, OP_JUMP_IF_FALSE, OP_AND, OP_OR, OP_LAMBDA, OP_MU, OP_CALL,
+ OP_TAIL_CALL, OP_RETURN, OP_RAISE) = range(17)
+
+class Bytecode:
+    """Compiled code: a list of integer CODE and a table of CONSTANTS, which
+    the operands of some opcodes index."""
+
+    __slots__ = ('code', 'constants')
+
+    def __init__(self):
+        self.code = []
+        self.constants = []
+
+    def emit(self, *words):
+        """Append an opcode and its operands to the code."""
+        self.code.extend(words)
+
+    def constant(self, value):
+        """Return the index of VALUE in the constants table."""
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def jump(self, op):
+        """Emit jump OP with an unknown target and return the target's index,
+        to be filled in by land."""
+        self.emit(op, None)
+        return len(self.code) - 1
+
+    def land(self, jumps):
+        """Make each jump in JUMPS target the next instruction."""
+        for index in jumps:
+            self.code[index] = len(self.code)
+
+def scheme_compile(expr, scope):
+    """Return the Bytecode of expression EXPR in SCOPE, which returns the value
+    of EXPR.
+
+    >>> bytecode = scheme_compile(read_line("(if (< 1 2) 'yes 'no)"), Scope(None))
+    >>> bytecode.code
+    [3, 0, 0, 0, 1, 0, 2, 13, 2, 8, 15, 0, 3, 7, 17, 0, 4, 15]
+    >>> run_bytecode(bytecode, create_global_frame())
+    'yes'
+    """
+    bytecode = Bytecode()
+    compile_expr(expr, bytecode, scope, True)
+    bytecode.emit(OP_RETURN)
+    return bytecode
+
+def compile_body(formals, body, scope):
+    """Return an AnalyzedBody whose node is the Bytecode of BODY, the body of a
+    procedure with Scheme list FORMALS called in the frame described by
+    SCOPE.  If SCOPE is None, calls bind the formals in a Frame whose parent
+    is unknown."""
+    formals = formal_names(formals)
+    if scope is None:
+        return AnalyzedBody(formals, scheme_compile(body, Scope(None)))
+    names = frame_names(formals, body)
+    return AnalyzedBody(formals, scheme_compile(body, Scope(names, scope)), names)
+
+def compile_expr(expr, bytecode, scope, tail=False):
+    """Append code to BYTECODE that pushes the value of EXPR in SCOPE.  If
+    TAIL, calls are compiled as tail calls.  Malformed special forms compile
+    to code that raises the error."""
+    start = len(bytecode.code)
+    try:
+        _compile_expr(expr, bytecode, scope, tail)
+    except SchemeError as err:
+        del bytecode.code[start:]
+        bytecode.emit(OP_RAISE, bytecode.constant(err.args))
+
+def _compile_expr(expr, bytecode, scope, tail):
+    if expr is None:
+        raise SchemeError("Cannot evaluate an undefined expression.")
+
+    # Compile Atoms
+    if scheme_symbolp(expr):
+        depth, index = scope.resolve(expr)
+        if index is None:
+            bytecode.emit(OP_NAME, depth, bytecode.constant(expr))
+        elif depth == 0:
+            bytecode.emit(OP_LOCAL, index)
+        else:
+            bytecode.emit(OP_LEXICAL, depth, index)
+        return
+    elif scheme_atomp(expr) or scheme_stringp(expr) or expr is okay:
+        bytecode.emit(OP_CONST, bytecode.constant(expr))
+        return
+
+    # All non-atomic expressions are lists.
+    if not scheme_listp(expr):
+        raise SchemeError("malformed list: {0}".format(str(expr)))
+    first, rest = expr.first, expr.second
+
+    # Compile Combinations
+    if scheme_symbolp(first) and first in COMPILED_FORMS:
+        COMPILED_FORMS[first](rest, bytecode, scope, tail)
+    else:
+        compile_expr(first, bytecode, scope)
+        operands = _scheme_items(rest)
+        for operand in operands:
+            compile_expr(operand, bytecode, scope)
+        bytecode.emit(OP_TAIL_CALL if tail else OP_CALL, len(operands))
+
+def compile_sequence(exprs, bytecode, scope, tail):
+    """Compile a non-empty Scheme list of EXPRS evaluated in order, leaving the
+    value of the last."""
+    items = _scheme_items(exprs)
+    for expr in items[:-1]:
+        compile_expr(expr, bytecode, scope)
+        bytecode.emit(OP_POP)
+    compile_expr(items[-1], bytecode, scope, tail)
+
+def compile_lambda_form(vals, bytecode, scope, tail):
+    check_form(vals, 2)
+    formals = vals[0]
+    body = Pair("begin", vals.second) if len(vals) > 2 else vals[1]
+    compiled = compile_body(formals, body, scope)
+    bytecode.emit(OP_LAMBDA, bytecode.constant((formals, body, compiled)))
+
+def compile_mu_form(vals, bytecode, scope, tail):
+    check_form(vals, 2)
+    formals = vals[0]
+    body = Pair("begin", vals.second) if len(vals) > 2 else vals[1]
+    compiled = compile_body(formals, body, None)
+    bytecode.emit(OP_MU, bytecode.constant((formals, body, compiled)))
+
+def compile_define_form(vals, bytecode, scope, tail):
+    check_form(vals, 2)
+    target = vals[0]
+    if scheme_symbolp(target):
+        check_form(vals, 2, 2)
+        compile_expr(vals[1], bytecode, scope)
+    elif isinstance(target, Pair) and scheme_symbolp(target.first):
+        compile_lambda_form(Pair(target.second, vals.second), bytecode, scope, False)
+        target = target.first
+    else:
+        raise SchemeError("bad argument to define")
+    index = scope.slot(target)
+    if index is None:
+        bytecode.emit(OP_DEFINE, bytecode.constant(target))
+    else:
+        bytecode.emit(OP_DEFINE_LOCAL, index, bytecode.constant(target))
+
+def compile_quote_form(vals, bytecode, scope, tail):
+    check_form(vals, 1, 1)
+    bytecode.emit(OP_CONST, bytecode.constant(vals.first))
+
+def compile_let_form(vals, bytecode, scope, tail):
+    """Compile a let form as a call to a lambda procedure."""
+    check_form(vals, 2)
+    bindings = vals[0]
+    if not scheme_listp(bindings):
+        raise SchemeError("bad bindings list in let form")
+    names, values = [], []
+    for binding in _scheme_items(bindings):
+        check_form(binding, 2, 2)
+        names.append(binding.first)
+        values.append(binding.second.first)
+    formals, body = scheme_list(*names), Pair("begin", vals.second)
+    compiled = compile_body(formals, body, scope)
+    bytecode.emit(OP_LAMBDA, bytecode.constant((formals, body, compiled)))
+    for value in values:
+        compile_expr(value, bytecode, scope)
+    bytecode.emit(OP_TAIL_CALL if tail else OP_CALL, len(values))
+
+def compile_if_form(vals, bytecode, scope, tail):
+    check_form(vals, 2, 3)
+    compile_expr(vals[0], bytecode, scope)
+    alternative = bytecode.jump(OP_JUMP_IF_FALSE)
+    compile_expr(vals[1], bytecode, scope, tail)
+    end = bytecode.jump(OP_JUMP)
+    bytecode.land([alternative])
+    if len(vals) > 2:
+        compile_expr(vals[2], bytecode, scope, tail)
+    else:
+        bytecode.emit(OP_CONST, bytecode.constant(okay))
+    bytecode.land([end])
+
+def compile_and_form(vals, bytecode, scope, tail, op=OP_AND):
+    if vals is nil:
+        bytecode.emit(OP_CONST, bytecode.constant(op == OP_AND))
+        return
+    items = _scheme_items(vals)
+    ends = []
+    for expr in items[:-1]:
+        compile_expr(expr, bytecode, scope)
+        ends.append(bytecode.jump(op))
+    compile_expr(items[-1], bytecode, scope, tail)
+    bytecode.land(ends)
+
+def compile_or_form(vals, bytecode, scope, tail):
+    compile_and_form(vals, bytecode, scope, tail, OP_OR)
+
+def compile_cond_form(vals, bytecode, scope, tail):
+    items = _scheme_items(vals)
+    ends = []
+    for i, clause in enumerate(items):
+        start = len(bytecode.code)
+        try:
+            check_form(clause, 1)
+            if clause.first == "else":
+                if i < len(items)-1:
+                    raise SchemeError("else must be last")
+                if clause.second is nil:
+                    raise SchemeError("badly formed else clause")
+                compile_sequence(clause.second, bytecode, scope, tail)
+                bytecode.land(ends)
+                return
+            compile_expr(clause.first, bytecode, scope)
+            if clause.second is nil:
+                ends.append(bytecode.jump(OP_OR)) # The value of the test
+            else:
+                next_clause = bytecode.jump(OP_JUMP_IF_FALSE)
+                compile_sequence(clause.second, bytecode, scope, tail)
+                ends.append(bytecode.jump(OP_JUMP))
+                bytecode.land([next_clause])
+        except SchemeError as err:
+            del bytecode.code[start:]
+            bytecode.emit(OP_RAISE, bytecode.constant(err.args))
+            break
+    bytecode.emit(OP_CONST, bytecode.constant(okay))
+    bytecode.land(ends)
+
+def compile_begin_form(vals, bytecode, scope, tail):
+    check_form(vals, 1)
+    compile_sequence(vals, bytecode, scope, tail)
+
+COMPILED_FORMS = {
+        "and": compile_and_form,
+        "or": compile_or_form,
+        "if": compile_if_form,
+        "cond": compile_cond_form,
+        "begin": compile_begin_form,
+        "lambda": compile_lambda_form,
+        "mu": compile_mu_form,
+        "define": compile_define_form,
+        "quote": compile_quote_form,
+        "let": compile_let_form,
+        }
+
+def procedure_bytecode(procedure):
+    """Return the compiled AnalyzedBody of a LambdaProcedure or MuProcedure,
+    compiling it first if it was created by another evaluator."""
+    if procedure.compiled is None:
+        scope = Scope(None) if isinstance(procedure, LambdaProcedure) else None
+        procedure.compiled = compile_body(procedure.formals, procedure.body, scope)
+    return procedure.compiled
+
+def run_bytecode(bytecode, env):
+    """Run BYTECODE in environment ENV and return the value it computes."""
+    code, constants, pc = bytecode.code, bytecode.constants, 0
+    stack = []   # Operands and intermediate values
+    returns = [] # (code, constants, pc, env) of each caller awaiting a value
+    while True:
+        op = code[pc]
+        if op == OP_LOCAL:
+            value = env.slots[code[pc+1]]
+            if value is _UNBOUND:
+                value = env.parent.lookup(env.names[code[pc+1]])
+            stack.append(value)
+            pc += 2
+        elif op == OP_NAME:
+            frame, symbol = env, constants[code[pc+2]]
+            for _ in range(code[pc+1]): # Symbols defined by eval are in extra
+                if frame.extra and symbol in frame.extra:
+                    break
+                frame = frame.parent
+            stack.append(frame.lookup(symbol))
+            pc += 3
+        elif op == OP_CONST:
+            stack.append(constants[code[pc+1]])
+            pc += 2
+        elif op == OP_CALL or op == OP_TAIL_CALL:
+            num_args = code[pc+1]
+            procedure = stack[-num_args-1]
+            args = stack[len(stack)-num_args:]
+            del stack[-num_args-1:]
+            pc += 2
+            if type(procedure) is PrimitiveProcedure:
+                stack.append(apply_primitive(procedure, args, env))
+                continue
+            elif isinstance(procedure, LambdaProcedure):
+                parent = procedure.env
+            elif isinstance(procedure, MuProcedure):
+                parent = env
+            else:
+                raise SchemeError("Cannot call {0}".format(str(procedure)))
+            compiled = procedure_bytecode(procedure)
+            if op == OP_CALL:
+                returns.append((code, constants, pc, env))
+            env = compiled.make_frame(parent, args)
+            code, constants, pc = compiled.node.code, compiled.node.constants, 0
+        elif op == OP_RETURN:
+            if not returns:
+                return stack.pop()
+            code, constants, pc, env = returns.pop()
+        elif op == OP_JUMP_IF_FALSE:
+            if stack.pop() is False:
+                pc = code[pc+1]
+            else:
+                pc += 2
+        elif op == OP_JUMP:
+            pc = code[pc+1]
+        elif op == OP_LEXICAL:
+            frame, shadowed = env, False
+            for _ in range(code[pc+1]): # Symbols defined by eval are in extra
+                shadowed = shadowed or bool(frame.extra)
+                frame = frame.parent
+            if shadowed:
+                value = env.lookup(frame.names[code[pc+2]])
+            else:
+                value = frame.slots[code[pc+2]]
+                if value is _UNBOUND:
+                    value = frame.parent.lookup(frame.names[code[pc+2]])
+            stack.append(value)
+            pc += 3
+        elif op == OP_POP:
+            stack.pop()
+            pc += 1
+        elif op == OP_AND or op == OP_OR:
+            if (stack[-1] is False) == (op == OP_AND):
+                pc = code[pc+1] # Keep the value of the whole form
+            else:
+                stack.pop()
+                pc += 2
+        elif op == OP_LAMBDA or op == OP_MU:
+            formals, body, compiled = constants[code[pc+1]]
+            if op == OP_LAMBDA:
+                procedure = LambdaProcedure(formals, body, env)
+            else:
+                procedure = MuProcedure(formals, body)
+            procedure.compiled = compiled
+            stack.append(procedure)
+            pc += 2
+        elif op == OP_DEFINE_LOCAL:
+            env.slots[code[pc+1]] = stack.pop()
+            stack.append(constants[code[pc+2]])
+            pc += 3
+        elif op == OP_DEFINE:
+            symbol = constants[code[pc+1]]
+            env.define(symbol, stack.pop())
+            stack.append(symbol)
+            pc += 2
+        elif op == OP_RAISE:
+            raise SchemeError(*constants[code[pc+1]])
+
+def scheme_vm_eval(expr, env):
+    """Evaluate Scheme expression EXPR in environment ENV by compiling it to
+    bytecode.
+
+    >>> expr = read_line("(begin (define (f x) (if (= x 0) 'done (f (- x 1)))) (f 5000))")
+    >>> scheme_vm_eval(expr, create_global_frame())
+    'done'
+    """
+    return run_bytecode(scheme_compile(expr, Scope(None)), env)
+
+def scheme_vm_apply(procedure, args, env):
+    """Apply Scheme PROCEDURE to argument values ARGS in environment ENV,
+    running the bytecode of compound procedures."""
+    args = _scheme_items(args)
+    if isinstance(procedure, PrimitiveProcedure):
+        return apply_primitive(procedure, args, env)
+    elif isinstance(procedure, LambdaProcedure):
+        compiled = procedure_bytecode(procedure)
+        return run_bytecode(compiled.node, compiled.make_frame(procedure.env, args))
+    elif isinstance(procedure, MuProcedure):
+        compiled = procedure_bytecode(procedure)
+        return run_bytecode(compiled.node, compiled.make_frame(env, args))
+    else:
+        raise SchemeError("Cannot call {0}".format(str(procedure)))
+
+
+#############
+# Profiling #
+#############
+
+# The profiling evaluator is scheme_optimized_eval with a record of each
+# procedure call kept by a Profiler.  A tail call replaces the caller's record
+# on the profiler's stack, just as it replaces the caller's frame.
+
+class ProcedureStats:
+    """Statistics about the calls of one procedure, known as NAME."""
+
+    __slots__ = ('name', 'calls', 'cumulative', 'self_time', 'frames',
+                 'depth', 'max_depth', 'started')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.cumulative = 0.0 # Time with at least one call active
+        self.self_time = 0.0  # Time spent in the procedure itself
+        self.frames = 0       # Frames allocated by its calls
+        self.depth = 0        # Calls currently active
+        self.max_depth = 0
+        self.started = 0.0    # When the outermost active call began
+
+class Profiler:
+    """Records the calls of Scheme procedures, attributing elapsed time to the
+    procedure at the top of a stack of active calls.
+
+    >>> profiler = Profiler()
+    >>> fact = LambdaProcedure(read_line("(n)"), read_line("n"), None)
+    >>> for depth in range(3):
+    ...     profiler.enter(fact, "fact")
+    >>> for depth in range(3):
+    ...     profiler.exit()
+    >>> stats = profiler.stats[fact]
+    >>> stats.name, stats.calls, stats.frames, stats.max_depth
+    ('fact', 3, 3, 3)
+    >>> list(profiler.stacks)
+    [('fact',), ('fact', 'fact'), ('fact', 'fact', 'fact')]
+    """
+
+    def __init__(self):
+        self.stats = {}  # ProcedureStats for each procedure
+        self.stacks = {} # Self time for each stack of procedure names
+        self.active = [] # ProcedureStats of the active calls
+        self.names = []  # Procedure names of the active calls
+        self.mark = time.perf_counter()
+
+    def _charge(self, now):
+        """Charge the time since the last event to the active call."""
+        if self.active:
+            elapsed = now - self.mark
+            self.active[-1].self_time += elapsed
+            stack = tuple(self.names)
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed
+        self.mark = now
+
+    def enter(self, procedure, name=None):
+        """Record the start of a call to PROCEDURE, applied by NAME."""
+        now = time.perf_counter()
+        self._charge(now)
+        stats = self.stats.get(procedure)
+        if stats is None:
+            stats = self.stats[procedure] = ProcedureStats(
+                name or procedure_name(procedure))
+        stats.calls += 1
+        if not isinstance(procedure, PrimitiveProcedure):
+            stats.frames += 1
+        stats.depth += 1
+        if stats.depth == 1:
+            stats.started = now
+        stats.max_depth = max(stats.max_depth, stats.depth)
+        self.active.append(stats)
+        self.names.append(stats.name)
+
+    def exit(self):
+        """Record the end of the most recently entered active call."""
+        now = time.perf_counter()
+        self._charge(now)
+        stats = self.active.pop()
+        self.names.pop()
+        stats.depth -= 1
+        if stats.depth == 0:
+            stats.cumulative += now - stats.started
+
+    def frame(self):
+        """Record a frame allocated by the active call, such as by let."""
+        if self.active:
+            self.active[-1].frames += 1
+
+    def report(self, file=sys.stdout, limit=None):
+        """Print the statistics of the procedures called, sorted by self time,
+        to FILE."""
+        stats = sorted(self.stats.values(), key=lambda s: s.self_time,
+                       reverse=True)
+        fmt = "{0:>9} {1:>11} {2:>11} {3:>9} {4:>7}  {5}"
+        print(fmt.format("calls", "cumulative", "self", "frames", "depth",
+                         "procedure"), file=file)
+        for s in stats[:limit]:
+            print(fmt.format(s.calls, "{0:.6f}".format(s.cumulative),
+                             "{0:.6f}".format(s.self_time), s.frames,
+                             s.max_depth, s.name), file=file)
+
+    def write_stacks(self, file):
+        """Write the self time in microseconds of each stack of procedure
+        names to FILE in the collapsed format read by flame graph tools."""
+        for stack, elapsed in sorted(self.stacks.items()):
+            print(';'.join(stack), round(elapsed * 1e6), file=file)
+
+def procedure_name(procedure):
+    """A short description of PROCEDURE for profiles."""
+    if isinstance(procedure, LambdaProcedure):
+        return "(lambda {0})".format(str(procedure.formals))
+    elif isinstance(procedure, MuProcedure):
+        return "(mu {0})".format(str(procedure.formals))
+    return str(procedure)
+
+profiler = Profiler()
+
+def scheme_profiled_eval(expr, env):
+    """Evaluate Scheme expression EXPR in environment ENV, recording procedure
+    calls in the module's profiler."""
+    entered = False # Whether this evaluation has a call active in profiler
+    try:
+        while True:
+            if expr is None:
+                raise SchemeError("Cannot evaluate an undefined expression.")
+
+            # Evaluate Atoms
+            if scheme_symbolp(expr):
+                return env.lookup(expr)
+            elif scheme_atomp(expr) or scheme_stringp(expr) or expr is okay:
+                return expr
+
+            # All non-atomic expressions are lists.
+            if not scheme_listp(expr):
+                raise SchemeError("malformed list: {0}".format(str(expr)))
+            first, rest = expr.first, expr.second
+
+            # Evaluate Combinations
+            if (scheme_symbolp(first) # first might be unhashable
+                and first in LOGIC_FORMS):
+                expr, env = LOGIC_FORMS[first](rest, env)
+                if env is None: # The form computed its value
+                    return expr
+                continue
+            elif first == "lambda":
+                return do_lambda_form(rest, env)
+            elif first == "mu":
+                return do_mu_form(rest)
+            elif first == "define":
+                return do_define_form(rest, env)
+            elif first == "quote":
+                return do_quote_form(rest)
+            elif first == "let":
+                expr, env = do_let_form(rest, env)
+                profiler.frame()
+                continue
+            procedure = scheme_profiled_eval(first, env)
+            args = rest.map(lambda operand: scheme_profiled_eval(operand, env))
+            name = first if scheme_symbolp(first) else None
+            if isinstance(procedure, (LambdaProcedure, MuProcedure)):
+                if isinstance(procedure, LambdaProcedure):
+                    env = procedure.env.make_call_frame(procedure.formals, args)
+                else:
+                    env = env.make_call_frame(procedure.formals, args)
+                if entered: # A tail call replaces the active call
+                    profiler.exit()
+                profiler.enter(procedure, name)
+                entered = True
+                expr = procedure.body
+                continue
+            profiler.enter(procedure, name)
+            try:
+                return scheme_profiled_apply(procedure, args, env)
+            finally:
+                profiler.exit()
+    finally:
+        if entered:
+            profiler.exit()
+
+def scheme_profiled_apply(procedure, args, env):
+    """Apply Scheme PROCEDURE to argument values ARGS in environment ENV,
+    recording calls of compound procedures in the module's profiler."""
+    if isinstance(procedure, PrimitiveProcedure):
+        return apply_primitive(procedure, args, env)
+    elif isinstance(procedure, LambdaProcedure):
+        frame = procedure.env.make_call_frame(procedure.formals, args)
+    elif isinstance(procedure, MuProcedure):
+        frame = env.make_call_frame(procedure.formals, args)
+    else:
+        raise SchemeError("Cannot call {0}".format(str(procedure)))
+    profiler.enter(procedure)
+    try:
+        return scheme_profiled_eval(procedure.body, frame)
+    finally:
+        profiler.exit()
+
+def scheme_profile(expr, env):
+    """Evaluate EXPR in ENV with the profiling evaluator, print the profile of
+    its procedure calls, and return its value.  The profile engine is in use
+    during the evaluation, so that special forms also evaluate their
+    subexpressions with the profiling evaluator.
+
+    >>> env = create_global_frame()
+    >>> define = "(define (fact n) (if (= n 0) 1 (* n (fact (- n 1)))))"
+    >>> _ = scheme_eval(read_line(define), env)
+    >>> port = OutputPort()
+    >>> previous = set_output_port(port)
+    >>> scheme_profile(read_line("(fact 5)"), env)
+    120
+    >>> _ = set_output_port(previous)
+    >>> sorted((row.split()[-1], int(row.split()[0]))
+    ...        for row in port.take().splitlines()[1:])
+    [('*', 5), ('-', 5), ('=', 6), ('fact', 6)]
+    """
+    global profiler, scheme_eval, scheme_apply
+    outer, profiler = profiler, Profiler()
+    engine = scheme_eval, scheme_apply
+    scheme_eval, scheme_apply = ENGINES['profile']
+    try:
+        return scheme_profiled_eval(expr, env)
+    finally:
+        scheme_eval, scheme_apply = engine
+        profiler.report(file=current_output_port())
+        profiler = outer
+
+
+##########
+# Output #
+##########
+
+def scheme_with_output_to_string(thunk, env):
+    """Call THUNK, a procedure of no arguments, with a new string port as the
+    current output port, and return the text written to it as a string.
+
+    >>> env = create_global_frame()
+    >>> expr = read_line("(with-output-to-string (lambda () (print 'hi)))")
+    >>> scheme_eval(expr, env)
+    String('hi\\n')
+    """
+    if not isinstance(thunk, (LambdaProcedure, MuProcedure,
+                              PrimitiveProcedure)):
+        raise SchemeError("argument 0 of with-output-to-string is not a "
+                          "procedure")
+    port = OutputPort()
+    previous = set_output_port(port)
+    try:
+        scheme_apply(thunk, nil, env)
+    finally:
+        set_output_port(previous)
+    return String(port.take())
+
+###############
+# Memoization #
+###############
+
+class Memo:
+    """A memoized Scheme PROCEDURE, called with the Scheme arguments followed
+    by the calling environment.  The values of the most recent calls are
+    cached, at most LIMIT of them, and the least recently used are evicted.
+
+    >>> env = create_global_frame()
+    >>> square = scheme_eval(read_line("(memoize (lambda (x) (* x x)) 2)"), env)
+    >>> calls = ["(3)", "(4)", "(3)", "(5)", "(4)"]
+    >>> [scheme_apply(square, read_line(args), env) for args in calls]
+    [9, 16, 9, 25, 16]
+    >>> memo = square.fn
+    >>> memo.hits, memo.misses, memo.evictions
+    (1, 4, 2)
+    """
+
+    def __init__(self, procedure, limit):
+        self.procedure = procedure
+        self.limit = limit
+        self.cache = collections.OrderedDict() # Least recently used first
+        self.hits = self.misses = self.evictions = 0
+
+    def __call__(self, *args):
+        args, env = args[:-1], args[-1]
+        key = tuple(hash_key(arg) for arg in args)
+        cache = self.cache
+        if key in cache:
+            self.hits += 1
+            cache.move_to_end(key)
+            return cache[key]
+        self.misses += 1
+        value = scheme_apply(self.procedure, scheme_list(*args), env)
+        cache[key] = value
+        if len(cache) > self.limit:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return value
+
+def scheme_memoize(procedure, *args):
+    """Return a procedure that applies PROCEDURE, caching the values of its
+    calls on up to LIMIT (default 1000) distinct argument lists.  ARGS are an
+    optional LIMIT followed by the calling environment."""
+    if not isinstance(procedure, (LambdaProcedure, MuProcedure,
+                                  PrimitiveProcedure)):
+        raise SchemeError("argument 0 of memoize is not a procedure")
+    if len(args) > 2:
+        raise SchemeError("wrong number of arguments to memoize")
+    limit = args[0] if len(args) == 2 else 1000
+    if type(limit) is not int or limit < 1:
+        raise SchemeError("argument 1 of memoize is not a positive integer")
+    return PrimitiveProcedure(Memo(procedure, limit), True)
+
+def scheme_memo_stats(procedure):
+    """Return an association list of the cache statistics of a procedure
+    returned by memoize."""
+    if not (isinstance(procedure, PrimitiveProcedure) and
+            isinstance(procedure.fn, Memo)):
+        raise SchemeError("argument 0 of memo-stats is not memoized")
+    memo = procedure.fn
+    stats = [("hits", memo.hits), ("misses", memo.misses),
+             ("evictions", memo.evictions), ("size", len(memo.cache)),
+             ("limit", memo.limit)]
+    return scheme_list(*(Pair(name, count) for name, count in stats))
+
+
+###########
+# Engines #
+###########
+
+# Each evaluation engine is a pair of eval and apply functions.  The engine in
+# use must be selected before create_global_frame binds eval and apply.
+ENGINES = {
+        "tail": (scheme_optimized_eval, scheme_apply),
+        "analyze": (scheme_analyzed_eval, scheme_analyzed_apply),
+        "lexical": (scheme_lexical_eval, scheme_analyzed_apply),
+        "machine": (scheme_machine_eval, scheme_apply),
+        "vm": (scheme_vm_eval, scheme_vm_apply),
+        "profile": (scheme_profiled_eval, scheme_profiled_apply),
+        }
+
+def use_engine(name):
+    """Evaluate all Scheme expressions with the engine called NAME."""
+    global scheme_eval, scheme_apply
+    if name not in ENGINES:
+        raise SchemeError("unknown engine: {0}".format(name))
+    scheme_eval, scheme_apply = ENGINES[name]
+
+
 ################
 # Input/Output #
 ################
@@ -451,21 +1948,22 @@ def read_eval_print_loop(next_line, env, quiet=False, startup=False,
             scheme_load(filename, True, env)
     while True:
         try:
+            current_output_port().flush() # Show output before each prompt
             src = next_line()
             while src.more_on_line:
                 expression = scheme_read(src)
                 result = scheme_eval(expression, env)
                 if not quiet and result is not None:
-                    print(result)
+                    print(result, file=current_output_port())
         except (SchemeError, SyntaxError, ValueError, RuntimeError) as err:
             if (isinstance(err, RuntimeError) and
                 'maximum recursion depth exceeded' not in err.args[0]):
                 raise
-            print("Error:", err)
+            print("Error:", err, file=current_output_port())
         except KeyboardInterrupt:  # <Control>-C
             if not startup:
                 raise
-            print("\nKeyboardInterrupt")
+            print("\nKeyboardInterrupt", file=current_output_port())
             if not interactive:
                 return
         except EOFError:  # <Control>-D, etc.
@@ -483,16 +1981,118 @@ def scheme_load(*args):
     quiet = args[1] if len(args) > 2 else True
     env = args[-1]
     if (scheme_stringp(sym)):
-        sym = eval(sym)
+        sym = sym.value
     check_type(sym, scheme_symbolp, 0, "load")
     with scheme_open(sym) as infile:
-        lines = infile.readlines()
-    args = (lines, None) if quiet else (lines,)
-    def next_line():
-        return buffer_lines(*args)
-    read_eval_print_loop(next_line, env.global_frame(), quiet=quiet)
+        if quiet:
+            eval_source(parsed_source(infile), env.global_frame())
+        else:
+            def next_line():
+                return buffer_lines(infile)
+            read_eval_print_loop(next_line, env.global_frame(), quiet=quiet)
     return okay
 
+# Quietly loaded files are parsed once and cached by absolute path, along with
+# the modification time and size of the file when it was parsed.  If
+# SAVE_PARSED_SOURCE is true, parsed files are also saved in a PARSE_CACHE_DIR
+# directory beside them, so that later runs need not parse them either.
+# PARSE_CACHE_FORMAT changes whenever the representation of parsed source
+# does, invalidating saved files.
+_parsed_sources = {}
+PARSE_CACHE_DIR = '__scmcache__'
+PARSE_CACHE_FORMAT = 2
+SAVE_PARSED_SOURCE = False
+
+def read_source(lines):
+    """Read the expressions in LINES, an iterable of strings, in the groups in
+    which read_eval_print_loop reads them.  Return a list of (expressions,
+    error) pairs, where error is the message of the syntax error that ended
+    the group, or None.
+
+    >>> read_source(["(define x 1) 'x", "(+ x", " 2)", ")"])
+    [([Pair('define', Pair('x', Pair(1, nil))), Pair('quote', Pair('x', nil))], None), ([Pair('+', Pair('x', Pair(2, nil)))], None), ([], 'unexpected token: )')]
+    """
+    lines, source = iter(lines), []
+    while True:
+        expressions = []
+        try:
+            src = buffer_lines(lines, None)
+            while src.more_on_line:
+                expressions.append(scheme_read(src))
+        except (SchemeError, SyntaxError, ValueError) as err:
+            source.append((expressions, str(err)))
+            continue
+        except EOFError:
+            if expressions:
+                source.append((expressions, None))
+            return source
+        source.append((expressions, None))
+
+def eval_source(source, env):
+    """Evaluate SOURCE, as returned by read_source, in environment ENV.  As in
+    read_eval_print_loop, an error skips the rest of its group, and (exit)
+    ends the evaluation of SOURCE.
+
+    >>> env = create_global_frame()
+    >>> eval_source(read_source(["(define a 1) (exit) (define b 2)"]), env)
+    >>> env.lookup("a"), "b" in env.bindings
+    (1, False)
+    """
+    for expressions, error in source:
+        try:
+            for expression in expressions:
+                scheme_eval(expression, env)
+        except EOFError:
+            return
+        except (SchemeError, SyntaxError, ValueError, RuntimeError) as err:
+            if (isinstance(err, RuntimeError) and
+                'maximum recursion depth exceeded' not in err.args[0]):
+                raise
+            print("Error:", err, file=current_output_port())
+            continue
+        if error is not None:
+            print("Error:", error, file=current_output_port())
+
+def parsed_source(infile):
+    """Return the parsed contents of open source file INFILE, reading it only
+    if it has changed since it was last parsed."""
+    path = os.path.abspath(infile.name)
+    stat = os.fstat(infile.fileno())
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _parsed_sources.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    directory, name = os.path.split(path)
+    cache_file = os.path.join(directory, PARSE_CACHE_DIR, name + '.pickle')
+    source = None
+    if SAVE_PARSED_SOURCE:
+        try:
+            with open(cache_file, 'rb') as saved:
+                saved_format, saved_version, source = pickle.load(saved)
+            if (saved_format, saved_version) != (PARSE_CACHE_FORMAT, version):
+                source = None
+        except Exception: # A missing, stale, or corrupt cache file is ignored
+            source = None
+    if source is None:
+        source = read_source(infile)
+        if SAVE_PARSED_SOURCE:
+            save_parsed_source(cache_file, version, source)
+    _parsed_sources[path] = (version, source)
+    return source
+
+def save_parsed_source(cache_file, version, source):
+    """Save SOURCE, parsed from a file at VERSION, in CACHE_FILE.  Failure to
+    save is ignored, since the cache only saves time."""
+    temporary = '{0}.{1}'.format(cache_file, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temporary, 'wb') as saved:
+            pickle.dump((PARSE_CACHE_FORMAT, version, source), saved)
+        os.replace(temporary, cache_file)
+    except (OSError, RecursionError, pickle.PicklingError):
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
 def scheme_open(filename):
     """If either FILENAME or FILENAME.scm is the name of a valid file,
     return a Python file opened to it. Otherwise, raise an error."""
@@ -512,29 +2112,156 @@ def create_global_frame():
     env.define("eval", PrimitiveProcedure(scheme_eval, True))
     env.define("apply", PrimitiveProcedure(scheme_apply, True))
     env.define("load", PrimitiveProcedure(scheme_load, True))
+    env.define("profile", PrimitiveProcedure(scheme_profile, True))
+    env.define("memoize", PrimitiveProcedure(scheme_memoize, True))
+    env.define("memo-stats", PrimitiveProcedure(scheme_memo_stats))
+    env.define("with-output-to-string",
+               PrimitiveProcedure(scheme_with_output_to_string, True))
     add_primitives(env)
     return env
 
+#############
+# Snapshots #
+#############
+
+# A snapshot is a global frame saved in a pickle file, along with every value
+# and procedure reachable from it.  Built-in procedures are saved by the name
+# they are bound to in a new global frame, and restored as the procedures
+# bound to that name when the snapshot is loaded, so that eval and apply use
+# the engine in use at that time.  Restoring a snapshot runs any code that it
+# names, so only snapshots from trusted sources should be restored.
+SNAPSHOT_FORMAT = 1
+
+class SnapshotPickler(pickle.Pickler):
+    """A pickler of global frames that saves built-in procedures by name."""
+
+    def __init__(self, file):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.builtins = {proc.fn: name for name, proc in
+                         create_global_frame().bindings.items()}
+
+    def persistent_id(self, obj):
+        if obj is _UNBOUND:
+            return ('unbound', None)
+        if type(obj) is PrimitiveProcedure and obj.fn in self.builtins:
+            return ('builtin', self.builtins[obj.fn])
+        return None
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """An unpickler of global frames that binds saved built-in procedures to
+    those of a new global frame."""
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.builtins = create_global_frame().bindings
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind == 'unbound':
+            return _UNBOUND
+        if name not in self.builtins:
+            raise pickle.UnpicklingError("unknown built-in: " + name)
+        return self.builtins[name]
+
+    def find_class(self, module, name):
+        if module in ('__main__', 'scheme'): # Saved by the script or module
+            module = __name__
+        return super().find_class(module, name)
+
+def save_snapshot(env, filename):
+    """Save the global frame ENV to the file FILENAME.
+
+    >>> import tempfile
+    >>> env = create_global_frame()
+    >>> for line in ["(define (square x) (* x x))", "(define first car)"]:
+    ...     _ = scheme_eval(read_line(line), env)
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     filename = os.path.join(directory, 'env.pickle')
+    ...     save_snapshot(env, filename)
+    ...     restored = restore_snapshot(filename)
+    >>> scheme_eval(read_line("(first (list (square 7) 2))"), restored)
+    49
+    """
+    temporary = '{0}.{1}'.format(filename, os.getpid())
+    try:
+        with open(temporary, 'wb') as saved:
+            SnapshotPickler(saved).dump((SNAPSHOT_FORMAT, env))
+        os.replace(temporary, filename)
+    except (OSError, RecursionError, pickle.PicklingError, TypeError) as exc:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise SchemeError("cannot save snapshot: {0}".format(exc))
+
+def restore_snapshot(filename):
+    """Return the global frame saved in the file FILENAME."""
+    try:
+        with open(filename, 'rb') as saved:
+            snapshot_format, env = SnapshotUnpickler(saved).load()
+    except Exception as exc:
+        raise SchemeError("cannot restore snapshot: {0}".format(exc))
+    if snapshot_format != SNAPSHOT_FORMAT or not isinstance(env, Frame):
+        raise SchemeError("cannot restore snapshot: unknown format")
+    return env
+
 @main
 def run(*argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='CS 61A Scheme interpreter')
+    parser.add_argument('-load', nargs='*', default=(), metavar='FILE',
+                        help='Scheme files to load before starting the REPL')
+    parser.add_argument('-engine', choices=sorted(ENGINES), default='tail',
+                        help='evaluation engine (default: tail)')
+    parser.add_argument('-cache', action='store_true',
+                        help='save parsed files that are loaded in {0} '
+                             'directories'.format(PARSE_CACHE_DIR))
+    parser.add_argument('-profile', action='store_true',
+                        help='print a profile of procedure calls on exit')
+    parser.add_argument('-stacks', metavar='FILE',
+                        help='write profiled call stacks to FILE in the '
+                             'collapsed format of flame graph tools')
+    parser.add_argument('-restore', metavar='FILE',
+                        help='start from the global frame saved in FILE')
+    parser.add_argument('-snapshot', metavar='FILE',
+                        help='save the global frame in FILE after loading '
+                             'the -load files')
+    parser.add_argument('file', nargs='?', help='Scheme file to run')
+    args = parser.parse_args(argv)
+
+    global SAVE_PARSED_SOURCE
+    SAVE_PARSED_SOURCE = args.cache
+    profiling = args.profile or args.stacks is not None
+    use_engine('profile' if profiling else args.engine)
     next_line = buffer_input
     interactive = True
-    load_files = ()
-    if argv:
+    if args.file is not None:
         try:
-            filename = argv[0]
-            if filename == '-load':
-                load_files = argv[1:]
-            else:
-                input_file = open(argv[0])
-                lines = input_file.readlines()
-                def next_line():
-                    return buffer_lines(lines)
-                interactive = False
+            input_file = open(args.file)
+            def next_line():
+                return buffer_lines(input_file)
+            interactive = False
         except IOError as err:
             print(err)
             sys.exit(1)
-    read_eval_print_loop(next_line, create_global_frame(), startup=True,
-                         interactive=interactive, load_files=load_files)
+    try:
+        if args.restore is not None:
+            env = restore_snapshot(args.restore)
+        else:
+            env = create_global_frame()
+        for filename in args.load:
+            scheme_load(filename, True, env)
+        if args.snapshot is not None:
+            save_snapshot(env, args.snapshot)
+    except SchemeError as err:
+        print("Error:", err)
+        sys.exit(1)
+    try:
+        read_eval_print_loop(next_line, env, startup=True,
+                             interactive=interactive)
+    finally:
+        stdout_port.flush()
+        if args.profile:
+            profiler.report(file=sys.stderr)
+        if args.stacks is not None:
+            with open(args.stacks, 'w') as stacks:
+                profiler.write_stacks(stacks)
     tscheme_exitonclick()
-
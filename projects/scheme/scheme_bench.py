@@ -0,0 +1,237 @@
+"""Benchmarks comparing representations of Scheme pairs and evaluation
+engines.
+
+Usage: python3 scheme_bench.py [N] [FILE]
+       python3 scheme_bench.py -engines [FILE]
+
+Compares the slotted Pair of scheme_reader, which caches the length of lists
+read from source code, with the legacy representation, which stores its
+attributes in a __dict__ and walks the list for every len() or index.  For
+each representation, reports the time and peak memory used to read a quoted
+list of N elements and repeatedly measure it, and to run the Scheme test FILE
+without its first (exit) line with scheme_test.
+
+Each measurement runs in a fresh Python process, so that the representation
+is chosen before any interpreter module binds the name Pair.
+
+With -engines, compares the evaluation engines of scheme.py on recursive
+arithmetic, tree recursion, tail-recursive list building, and the Scheme test
+FILE without its first (exit) line, reporting the best of several runs of
+each.
+"""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import scheme_reader
+from scheme_reader import Pair, nil
+from ucb import main
+
+class LegacyPair:
+    """A pair whose attributes are stored in a __dict__ and whose length is
+    never cached, as Pair was represented before it had __slots__."""
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    @property
+    def length(self):
+        return None
+
+    @length.setter
+    def length(self, length):
+        pass # Legacy pairs do not cache lengths
+
+    def __len__(self):
+        n, second = 1, self.second
+        while isinstance(second, LegacyPair):
+            n += 1
+            second = second.second
+        if second is not nil:
+            raise TypeError("length attempted on improper list")
+        return n
+
+    def __getitem__(self, k):
+        if k < 0:
+            raise IndexError("negative index into list")
+        y = self
+        for _ in range(k):
+            if y.second is nil:
+                raise IndexError("list index out of bounds")
+            elif not isinstance(y.second, LegacyPair):
+                raise TypeError("ill-formed list")
+            y = y.second
+        return y.first
+
+    __repr__ = Pair.__repr__
+    __str__ = Pair.__str__
+    __eq__ = Pair.__eq__
+    map = Pair.map
+
+REPRESENTATIONS = {
+        "slotted": Pair,
+        "legacy": LegacyPair,
+        }
+
+def quoted_list_lines(n, per_line=20):
+    """Source lines for a quoted list of the numbers 0 to N-1."""
+    numbers = [str(i) for i in range(n)]
+    lines = ["(define big '("]
+    for i in range(0, n, per_line):
+        lines.append(' '.join(numbers[i:i+per_line]))
+    lines.append("))")
+    return lines
+
+def measure_quoted_list(n):
+    """Read and evaluate the definition of a quoted list of N elements, then
+    check its form and length as the special forms do."""
+    from scheme import scheme_eval, create_global_frame, check_form
+    env = create_global_frame()
+    src = scheme_reader.buffer_lines(quoted_list_lines(n), show_prompt=True)
+    scheme_eval(scheme_reader.scheme_read(src), env)
+    big = env.lookup("big")
+    for _ in range(100):
+        check_form(big, n, n)
+        assert len(big) == n
+    return big
+
+def measure_tests(src_file):
+    """Run the Scheme tests in SRC_FILE, discarding their output."""
+    import scheme_test
+    stdout, sys.stdout = sys.stdout, io.StringIO()
+    try:
+        scheme_test.run_tests(src_file)
+    finally:
+        sys.stdout = stdout
+
+ENGINE_PROGRAMS = [
+        ("fib 18",
+         "(define (fib n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))",
+         "(fib 18)"),
+        ("tree of depth 12",
+         """(define (tree d) (if (= d 0) nil
+                               (cons (tree (- d 1)) (tree (- d 1)))))
+            (define (leaves t) (cond ((null? t) 1)
+                                     (else (+ (leaves (car t))
+                                              (leaves (cdr t))))))""",
+         "(leaves (tree 12))"),
+        ("build list of 20000",
+         """(define (build n s) (if (= n 0) s (build (- n 1) (cons n s))))""",
+         "(length (build 20000 nil))"),
+        ]
+
+def time_engine(engine, defines, expr, repeat=3):
+    """Return the best time to evaluate EXPR with ENGINE in a global frame in
+    which the expressions in DEFINES have been evaluated."""
+    import scheme
+    scheme.use_engine(engine)
+    env = scheme.create_global_frame()
+    src = scheme_reader.buffer_lines(defines.split('\n'), show_prompt=True)
+    while src.current() is not None:
+        scheme.scheme_eval(scheme_reader.scheme_read(src), env)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scheme.scheme_eval(scheme_reader.read_line(expr), env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def time_engine_tests(engine, src_file, repeat=3):
+    """Return the best time to run the Scheme tests in SRC_FILE with ENGINE."""
+    import scheme_test
+    best = None
+    for _ in range(repeat):
+        # run_tests collects the output of the tests in its own output port,
+        # and prints its summary to sys.stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            scheme_test.run_tests(src_file, engine)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def without_first_exit(src_file):
+    """Return the name of a temporary copy of the Scheme test SRC_FILE without
+    its first (exit) line, which otherwise ends it after a few tests."""
+    with open(src_file) as src:
+        lines = src.readlines()
+    for i, line in enumerate(lines):
+        if line.strip() == "(exit)":
+            del lines[i]
+            break
+    directory = os.path.dirname(os.path.abspath(src_file))
+    with tempfile.NamedTemporaryFile('w', suffix='.scm', dir=directory,
+                                     delete=False) as copy:
+        copy.writelines(lines)
+    return copy.name
+
+def compare_engines(src_file):
+    """Print the best time of each benchmark program with each engine."""
+    from scheme import ENGINES
+    print("{0:<24}".format("benchmark") +
+          "".join("{0:>10}".format(engine) for engine in ENGINES))
+    for name, defines, expr in ENGINE_PROGRAMS:
+        times = [time_engine(engine, defines, expr) for engine in ENGINES]
+        print("{0:<24}".format(name) +
+              "".join("{0:>10.3f}".format(t) for t in times))
+    full_file = without_first_exit(src_file)
+    try:
+        times = [time_engine_tests(engine, full_file) for engine in ENGINES]
+    finally:
+        os.remove(full_file)
+    print("{0:<24}".format(src_file) +
+          "".join("{0:>10.3f}".format(t) for t in times))
+
+def measure(representation, kind, arg):
+    """Print the time and peak memory of one measurement of KIND with ARG, using
+    the named Pair REPRESENTATION."""
+    scheme_reader.Pair = REPRESENTATIONS[representation]
+    tracemalloc.start()
+    start = time.perf_counter()
+    if kind == "quoted":
+        measure_quoted_list(int(arg))
+    else:
+        measure_tests(arg)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    print("RESULT", elapsed, peak)
+
+def run_measurement(representation, kind, arg):
+    """Return the (seconds, peak bytes) of a measurement in a new process."""
+    command = [sys.executable, __file__, "-measure", representation, kind, arg]
+    output = subprocess.run(command, capture_output=True, text=True,
+                            check=True).stdout
+    result = [line for line in output.split('\n') if line.startswith("RESULT")]
+    seconds, peak = result[-1].split()[1:]
+    return float(seconds), int(peak)
+
+@main
+def run(*args):
+    if args and args[0] == "-measure":
+        measure(*args[1:])
+        return
+    if args and args[0] == "-engines":
+        compare_engines(args[1] if len(args) > 1 else "tests.scm")
+        return
+    n = args[0] if args else "100000"
+    src_file = args[1] if len(args) > 1 else "tests.scm"
+    full_file = without_first_exit(src_file)
+    benchmarks = [("quoted list of {0}".format(n), "quoted", n),
+                  (src_file, "tests", full_file)]
+    print("{0:<24}{1:>10}{2:>12}{3:>14}".format("benchmark", "pair",
+                                                  "seconds", "peak KiB"))
+    try:
+        for name, kind, arg in benchmarks:
+            for representation in REPRESENTATIONS:
+                seconds, peak = run_measurement(representation, kind, arg)
+                print("{0:<24}{1:>10}{2:>12.3f}{3:>14,}".format(
+                    name, representation, seconds, peak // 1024))
+    finally:
+        os.remove(full_file)
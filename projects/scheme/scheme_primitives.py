@@ -1,9 +1,11 @@
 """This module implements the primitives of the Scheme language."""
 
+import atexit
+import inspect
 import math
 import operator
 import sys
-from scheme_reader import Pair, nil
+from scheme_reader import Pair, nil, String, Vector, HashTable
 
 try:
     import turtle
@@ -18,6 +20,9 @@ class okay:
     def __repr__(self):
         return "okay"
 
+    def __reduce__(self):
+        return "okay" # Unpickle as the one instance
+
 okay = okay() # Assignment hides the okay class; there is only one instance
 
 ########################
@@ -25,21 +30,53 @@ okay = okay() # Assignment hides the okay class; there is only one instance
 ########################
 
 class PrimitiveProcedure:
-    """A Scheme procedure defined as a Python function."""
+    """A Scheme procedure defined as a Python function.
+
+    FN accepts between MIN_ARGS and MAX_ARGS arguments (MAX_ARGS is None for
+    any number), followed by the calling environment if USE_ENV is true.
+    FAST, if not None, is a function of exactly FAST_ARITY arguments that
+    computes the same result as FN, typically by checking for common
+    argument types before falling back to FN.
+
+    >>> proc = PrimitiveProcedure(scheme_sub, fast=_fast_sub)
+    >>> proc.min_args, proc.max_args, proc.fast_arity
+    (1, None, 2)
+    """
 
-    def __init__(self, fn, use_env=False):
+    def __init__(self, fn, use_env=False, fast=None):
         self.fn = fn
         self.use_env = use_env
+        self.min_args, self.max_args = _arity(fn)
+        if use_env:
+            self.min_args -= 1
+            if self.max_args is not None:
+                self.max_args -= 1
+        self.fast = fast
+        self.fast_arity = -1 if fast is None else _arity(fast)[0]
 
     def __str__(self):
         return '#[primitive]'
 
+def _arity(fn):
+    """The minimum and maximum (or None) numbers of positional arguments to FN."""
+    min_args, max_args = 0, 0
+    for param in inspect.signature(fn).parameters.values():
+        if param.kind == param.VAR_POSITIONAL:
+            max_args = None
+        elif param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            if param.default is param.empty:
+                min_args += 1
+            if max_args is not None:
+                max_args += 1
+    return min_args, max_args
+
 _PRIMITIVES = []
 
-def primitive(*names):
-    """An annotation to convert a Python function into a PrimitiveProcedure."""
+def primitive(*names, fast=None):
+    """An annotation to convert a Python function into a PrimitiveProcedure,
+    with FAST as its fast implementation."""
     def add(fn):
-        proc = PrimitiveProcedure(fn)
+        proc = PrimitiveProcedure(fn, fast=fast)
         for name in names:
             _PRIMITIVES.append((name,proc))
         return fn
@@ -92,6 +129,8 @@ def scheme_listp(x):
     while x is not nil:
         if not isinstance(x, Pair):
             return False
+        if x.length is not None: # A well-formed source list
+            return True
         x = x.second
     return True
 
@@ -102,16 +141,26 @@ def scheme_length(x):
     check_type(x, scheme_listp, 0, 'length')
     return len(x)
 
-@primitive("cons")
+@primitive("cons", fast=Pair)
 def scheme_cons(x, y):
     return Pair(x, y)
 
-@primitive("car")
+def _fast_car(x):
+    if type(x) is Pair:
+        return x.first
+    return scheme_car(x)
+
+@primitive("car", fast=_fast_car)
 def scheme_car(x):
     check_type(x, scheme_pairp, 0, 'car')
     return x.first
 
-@primitive("cdr")
+def _fast_cdr(x):
+    if type(x) is Pair:
+        return x.second
+    return scheme_cdr(x)
+
+@primitive("cdr", fast=_fast_cdr)
 def scheme_cdr(x):
     check_type(x, scheme_pairp, 0, 'cdr')
     return x.second
@@ -144,11 +193,11 @@ def scheme_append(*vals):
 
 @primitive("string?")
 def scheme_stringp(x):
-    return isinstance(x, str) and x.startswith('"')
+    return isinstance(x, String)
 
 @primitive("symbol?")
 def scheme_symbolp(x):
-    return isinstance(x, str) and not scheme_stringp(x)
+    return isinstance(x, str)
 
 @primitive("number?")
 def scheme_numberp(x):
@@ -176,17 +225,35 @@ def _arith(fn, init, vals):
         s = round(s)
     return s
 
-@primitive("+")
+# Fast implementations of binary arithmetic compute exact results for ints,
+# which _arith would not change.
+
+def _fast_add(x, y):
+    if type(x) is int and type(y) is int:
+        return x + y
+    return _arith(operator.add, 0, (x, y))
+
+@primitive("+", fast=_fast_add)
 def scheme_add(*vals):
     return _arith(operator.add, 0, vals)
 
-@primitive("-")
+def _fast_sub(x, y):
+    if type(x) is int and type(y) is int:
+        return x - y
+    return _arith(operator.sub, x, (y,))
+
+@primitive("-", fast=_fast_sub)
 def scheme_sub(val0, *vals):
     if len(vals) == 0:
         return -val0
     return _arith(operator.sub, val0, vals)
 
-@primitive("*")
+def _fast_mul(x, y):
+    if type(x) is int and type(y) is int:
+        return x * y
+    return _arith(operator.mul, 1, (x, y))
+
+@primitive("*", fast=_fast_mul)
 def scheme_mul(*vals):
     return _arith(operator.mul, 1, vals)
 
@@ -225,11 +292,23 @@ def _numcomp(op, x, y):
     _check_nums(x, y)
     return op(x, y)
 
-@primitive("=")
+_NUMBER_TYPES = (int, float)
+
+def _fast_eq(x, y):
+    if type(x) in _NUMBER_TYPES and type(y) in _NUMBER_TYPES:
+        return x == y
+    return _numcomp(operator.eq, x, y)
+
+@primitive("=", fast=_fast_eq)
 def scheme_eq(x, y):
     return _numcomp(operator.eq, x, y)
 
-@primitive("<")
+def _fast_lt(x, y):
+    if type(x) in _NUMBER_TYPES and type(y) in _NUMBER_TYPES:
+        return x < y
+    return _numcomp(operator.lt, x, y)
+
+@primitive("<", fast=_fast_lt)
 def scheme_lt(x, y):
     return _numcomp(operator.lt, x, y)
 
@@ -260,6 +339,224 @@ def scheme_zerop(x):
     _check_nums(x)
     return x == 0
 
+##
+## Vectors and strings
+##
+
+def _check_index(k, size, i, name):
+    """Returns K.  Raises a SchemeError unless K is an integer index less than
+    SIZE, using "argument I of NAME" to describe it.
+
+    >>> for k in (2, 1.5):
+    ...     try:
+    ...         _check_index(k, 2, 1, "vector-ref")
+    ...     except SchemeError as err:
+    ...         print(err)
+    argument 1 of vector-ref is out of range (2)
+    argument 1 of vector-ref has wrong type (float)
+    """
+    if type(k) is not int:
+        check_type(k, scheme_integerp, i, name)
+        k = round(k)
+    if not 0 <= k < size:
+        msg = "argument {0} of {1} is out of range ({2})"
+        raise SchemeError(msg.format(i, name, k))
+    return k
+
+@primitive("vector?")
+def scheme_vectorp(x):
+    return isinstance(x, Vector)
+
+@primitive("make-vector")
+def scheme_make_vector(k, fill=0):
+    check_type(k, scheme_integerp, 0, "make-vector")
+    if k < 0:
+        raise SchemeError("argument 0 of make-vector is negative ({0})".format(k))
+    return Vector([fill] * round(k))
+
+@primitive("vector")
+def scheme_vector(*vals):
+    return Vector(list(vals))
+
+@primitive("vector-length")
+def scheme_vector_length(v):
+    check_type(v, scheme_vectorp, 0, "vector-length")
+    return len(v.items)
+
+@primitive("vector-ref")
+def scheme_vector_ref(v, k):
+    check_type(v, scheme_vectorp, 0, "vector-ref")
+    return v.items[_check_index(k, len(v.items), 1, "vector-ref")]
+
+@primitive("vector-set!")
+def scheme_vector_set(v, k, val):
+    check_type(v, scheme_vectorp, 0, "vector-set!")
+    v.items[_check_index(k, len(v.items), 1, "vector-set!")] = val
+    return okay
+
+@primitive("vector->list")
+def scheme_vector_to_list(v):
+    check_type(v, scheme_vectorp, 0, "vector->list")
+    return scheme_list(*v.items)
+
+@primitive("list->vector")
+def scheme_list_to_vector(x):
+    check_type(x, scheme_listp, 0, "list->vector")
+    return Vector(list(x) if x is not nil else [])
+
+@primitive("string-length")
+def scheme_string_length(s):
+    check_type(s, scheme_stringp, 0, "string-length")
+    return len(s.value)
+
+@primitive("string-append")
+def scheme_string_append(*strings):
+    for i, s in enumerate(strings):
+        check_type(s, scheme_stringp, i, "string-append")
+    return String("".join(s.value for s in strings))
+
+@primitive("substring")
+def scheme_substring(s, start, end=None):
+    check_type(s, scheme_stringp, 0, "substring")
+    size = len(s.value)
+    end = size if end is None else _check_index(end, size + 1, 2, "substring")
+    start = _check_index(start, end + 1, 1, "substring")
+    return String(s.value[start:end])
+
+##
+## Hash tables
+##
+
+def hash_key(x):
+    """A hashable Python value for Scheme value X, such that the values for two
+    Scheme values are equal whenever equal? is true of them.  Booleans are
+    distinguished from the numbers that Python considers equal to them, and
+    each list is represented by a tuple of the values for its elements."""
+    if type(x) is bool:
+        return (bool, x)
+    elif isinstance(x, Pair):
+        items = []
+        while isinstance(x, Pair):
+            items.append(hash_key(x.first))
+            x = x.second
+        items.append(hash_key(x))
+        return (Pair, tuple(items))
+    try:
+        hash(x)
+    except TypeError:
+        raise SchemeError("unhashable key: {0}".format(x))
+    return x
+
+@primitive("hash-table?")
+def scheme_hash_tablep(x):
+    return isinstance(x, HashTable)
+
+@primitive("make-hash-table")
+def scheme_make_hash_table():
+    return HashTable()
+
+_NO_DEFAULT = object()
+
+@primitive("hash-ref")
+def scheme_hash_ref(table, key, default=_NO_DEFAULT):
+    check_type(table, scheme_hash_tablep, 0, "hash-ref")
+    entry = table.entries.get(hash_key(key))
+    if entry is not None:
+        return entry[1]
+    elif default is not _NO_DEFAULT:
+        return default
+    raise SchemeError("key not found: {0}".format(key))
+
+@primitive("hash-set!")
+def scheme_hash_set(table, key, val):
+    check_type(table, scheme_hash_tablep, 0, "hash-set!")
+    table.entries[hash_key(key)] = (key, val)
+    return okay
+
+@primitive("hash-count")
+def scheme_hash_count(table):
+    check_type(table, scheme_hash_tablep, 0, "hash-count")
+    return len(table.entries)
+
+@primitive("hash-keys")
+def scheme_hash_keys(table):
+    check_type(table, scheme_hash_tablep, 0, "hash-keys")
+    return scheme_list(*(key for key, val in table.entries.values()))
+
+##
+## Output ports
+##
+
+class OutputPort:
+    """A port to which Scheme programs write text.  Written text is buffered
+    until the port is flushed to FILE, a Python file.  A string port, whose
+    FILE is None, keeps its text until it is taken.
+
+    >>> port = OutputPort()
+    >>> port.write("a"); port.write("b\\n")
+    >>> port.take(), port.take()
+    ('ab\\n', '')
+    """
+
+    LIMIT = 1 << 16 # Characters buffered before a file port flushes itself
+    file = None
+
+    def __init__(self, file=None):
+        if file is not None:
+            self.file = file
+        self.pieces = []
+        self.size = 0
+
+    def write(self, text):
+        self.pieces.append(text)
+        self.size += len(text)
+        if self.size > self.LIMIT and self.file is not None:
+            self.flush()
+
+    def take(self):
+        """Remove and return the buffered text."""
+        text = "".join(self.pieces)
+        self.pieces.clear()
+        self.size = 0
+        return text
+
+    def flush(self):
+        """Write the buffered text to FILE, if this is not a string port."""
+        file = self.file
+        if self.pieces and file is not None:
+            file.write(self.take())
+            file.flush()
+
+class StdoutPort:
+    """The port to the standard output, which is looked up on every write, so
+    that output follows any replacement of sys.stdout.  Unlike an OutputPort,
+    it keeps no buffer of its own: text is passed on to sys.stdout as it is
+    written, in order with anything else printed there."""
+
+    @property
+    def file(self):
+        return sys.stdout
+
+    def write(self, text):
+        sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+stdout_port = StdoutPort()
+atexit.register(stdout_port.flush)
+_output_port = stdout_port
+
+def current_output_port():
+    """The port to which display, print, and newline write."""
+    return _output_port
+
+def set_output_port(port):
+    """Make PORT the current output port and return the previous one."""
+    global _output_port
+    previous, _output_port = _output_port, port
+    return previous
+
 ##
 ## Other operations
 ##
@@ -279,19 +576,18 @@ def scheme_atomp(x):
 @primitive("display")
 def scheme_display(val):
     if scheme_stringp(val):
-        val = eval(val)
-    print(str(val), end="")
+        val = val.value
+    _output_port.write(str(val))
     return okay
 
 @primitive("print")
 def scheme_print(val):
-    print(str(val))
+    _output_port.write(str(val) + "\n")
     return okay
 
 @primitive("newline")
 def scheme_newline():
-    print()
-    sys.stdout.flush()
+    _output_port.write("\n")
     return okay
 
 @primitive("error")
@@ -424,7 +720,7 @@ def tscheme_color(c):
     hexadecimal red, green, and blue values."""
     _tscheme_prep()
     check_type(c, scheme_stringp, 0, "color")
-    turtle.color(eval(c))
+    turtle.color(c.value)
     return okay
 
 @primitive("begin_fill")
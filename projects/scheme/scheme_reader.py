@@ -15,6 +15,8 @@ The __str__ method of a Scheme value will return a Scheme expression that
 would be read to the value, where possible.
 """
 
+import ast
+import warnings
 from ucb import main, trace, interact
 from scheme_tokens import tokenize_lines, DELIMITERS
 from buffer import Buffer, InputReader, LineReader
@@ -37,27 +39,62 @@ class Pair:
     2
     >>> print(s.map(lambda x: x+4))
     (5 6)
+
+    Methods that traverse a Pair do not recurse, so they apply to lists of
+    any length and nesting depth.
+
+    A Pair that begins a well-formed list read from source code also records
+    the LENGTH of that list, which is None for all other Pairs.  Source lists
+    are never mutated, so their lengths remain valid.
+
+    >>> read_line("(1 2 3)").length
+    3
+    >>> Pair(1, nil).length is None
+    True
     """
+    __slots__ = ('first', 'second', 'length')
+
     def __init__(self, first, second):
         self.first = first
         self.second = second
+        self.length = None
 
     def __repr__(self):
-        return "Pair({0}, {1})".format(repr(self.first), repr(self.second))
+        s, depth, rest = [], 0, self
+        while isinstance(rest, Pair):
+            s.append("Pair({0}, ".format(repr(rest.first)))
+            depth, rest = depth + 1, rest.second
+        return "".join(s) + repr(rest) + ")" * depth
 
     def __str__(self):
-        s = "(" + str(self.first)
-        second = self.second
-        while isinstance(second, Pair):
-            s += " " + str(second.first)
-            second = second.second
-        if second is not nil:
-            s += " . " + str(second)
-        return s + ")"
+        """
+        >>> print(read_line("((1 (2)) . (3 . 4))"))
+        ((1 (2)) 3 . 4)
+        """
+        s = []
+        rests = [(self, True)] # Remainders of the lists being printed
+        while rests:
+            rest, start = rests.pop()
+            if rest is nil:
+                s.append(")")
+            elif not isinstance(rest, Pair):
+                s.append(" . " + str(rest) + ")")
+            else:
+                s.append("(" if start else " ")
+                rests.append((rest.second, False))
+                if isinstance(rest.first, Pair):
+                    rests.append((rest.first, True))
+                else:
+                    s.append(str(rest.first))
+        return "".join(s)
 
     def __len__(self):
+        if self.length is not None:
+            return self.length
         n, second = 1, self.second
         while isinstance(second, Pair):
+            if second.length is not None:
+                return n + second.length
             n += 1
             second = second.second
         if second is not nil:
@@ -76,18 +113,67 @@ class Pair:
             y = y.second
         return y.first
 
+    def __iter__(self):
+        rest = self
+        while isinstance(rest, Pair):
+            yield rest.first
+            rest = rest.second
+        if rest is not nil:
+            raise TypeError("ill-formed list")
+
     def __eq__(self, p):
-        if not isinstance(p, Pair):
-            return False
-        return self.first == p.first and self.second == p.second
+        pairs = [(self, p)] # Corresponding lists still to compare
+        while pairs:
+            x, y = pairs.pop()
+            while isinstance(x, Pair):
+                if not isinstance(y, Pair):
+                    return False
+                if isinstance(x.first, Pair):
+                    pairs.append((x.first, y.first))
+                elif isinstance(y.first, Pair) or x.first != y.first:
+                    return False
+                x, y = x.second, y.second
+            if isinstance(y, Pair) or x != y:
+                return False
+        return True
 
     def map(self, fn):
         """Return a Scheme list after mapping Python function FN to SELF."""
-        mapped = fn(self.first)
-        if self.second is nil or isinstance(self.second, Pair):
-            return Pair(mapped, self.second.map(fn))
-        else:
+        mapped, rest = [], self
+        while isinstance(rest, Pair):
+            mapped.append(fn(rest.first))
+            rest = rest.second
+        if rest is not nil:
             raise TypeError("ill-formed list")
+        result = nil
+        for value in reversed(mapped):
+            result = Pair(value, result)
+        return result
+
+    def __reduce__(self):
+        """Pickle the elements of a list rather than its nested pairs, so that
+        long lists do not exceed the recursion limit.
+
+        >>> import pickle
+        >>> s = pickle.loads(pickle.dumps(read_line("(1 (2 3) . 4)")))
+        >>> print(s), s.second.first.length
+        (1 (2 3) . 4)
+        (None, 2)
+        """
+        items, rest = [], self
+        while isinstance(rest, Pair):
+            items.append(rest.first)
+            rest = rest.second
+        return (_unpickle_list, (items, rest, self.length))
+
+def _unpickle_list(items, rest, length):
+    """The Pairs pickled by Pair.__reduce__, with the cached lengths of a list
+    read from source code if LENGTH is not None."""
+    for n, item in enumerate(reversed(items), 1):
+        rest = Pair(item, rest)
+        if length is not None:
+            rest.length = n
+    return rest
 
 class nil:
     """The empty list"""
@@ -98,6 +184,9 @@ class nil:
     def __str__(self):
         return "()"
 
+    def __reduce__(self):
+        return "nil" # Unpickle as the one instance
+
     def __len__(self):
         return 0
 
@@ -111,6 +200,107 @@ class nil:
 
 nil = nil() # Assignment hides the nil class; there is only one instance
 
+# Strings and vectors
+
+class String:
+    r"""A Scheme string, whose characters are the Python string VALUE.
+
+    >>> s = read_line('"say \\"hi\\"\\n"')
+    >>> s
+    String('say "hi"\n')
+    >>> print(s)
+    "say \"hi\"\n"
+    >>> len(s.value)
+    9
+    """
+    __slots__ = ('value',)
+
+    _UNESCAPED = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\t': '\\t',
+                  '\r': '\\r', '\0': '\\0'}
+
+    def __init__(self, value):
+        self.value = value
+
+    @classmethod
+    def parse(cls, token):
+        r"""The String denoted by TOKEN, a string literal in source code.
+        Escape sequences mean what they do in a Python string literal, and a
+        backslash before any other character is kept.
+
+        >>> [String.parse(token).value for token in (r'"\x41\t"', r'"\q"')]
+        ['A\t', '\\q']
+        """
+        body = token[1:-1]
+        if '\\' not in body:
+            return cls(body)
+        with warnings.catch_warnings(): # Unknown escapes are deprecated
+            warnings.simplefilter('ignore')
+            try:
+                return cls(ast.literal_eval(token))
+            except (SyntaxError, ValueError):
+                raise ValueError("invalid string: {0}".format(token))
+
+    def __repr__(self):
+        return "String({0})".format(repr(self.value))
+
+    def __str__(self):
+        unescaped = self._UNESCAPED
+        return '"' + ''.join(unescaped.get(c, c) for c in self.value) + '"'
+
+    def __eq__(self, other):
+        return isinstance(other, String) and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+class Vector:
+    """A Scheme vector, whose elements are those of the Python list ITEMS.
+
+    >>> v = Vector([1, Pair(2, nil), String("three")])
+    >>> v
+    Vector([1, Pair(2, nil), String('three')])
+    >>> print(v)
+    #(1 (2) "three")
+    """
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __repr__(self):
+        return "Vector({0})".format(repr(self.items))
+
+    def __str__(self):
+        return "#(" + " ".join(str(item) for item in self.items) + ")"
+
+    def __len__(self):
+        return len(self.items)
+
+    def __eq__(self, other):
+        return isinstance(other, Vector) and self.items == other.items
+
+    __hash__ = None # Vectors are mutable
+
+class HashTable:
+    """A Scheme hash table.  ENTRIES maps a hashable Python key computed from
+    each Scheme key to a (key, value) pair, in insertion order.
+
+    >>> HashTable()
+    HashTable({})
+    >>> print(HashTable())
+    #[hash-table 0]
+    """
+    __slots__ = ('entries',)
+
+    def __init__(self, entries=None):
+        self.entries = {} if entries is None else entries
+
+    def __repr__(self):
+        return "HashTable({0})".format(repr(self.entries))
+
+    def __str__(self):
+        return "#[hash-table {0}]".format(len(self.entries))
+
 # Scheme list parser
 
 
@@ -128,17 +318,7 @@ def scheme_read(src):
     """
     if src.current() is None:
         raise EOFError
-    val = src.pop()
-    if val == "nil":
-        return nil
-    elif val not in DELIMITERS:
-        return val
-    elif val == "'":
-        return Pair('quote', Pair(scheme_read(src), nil))
-    elif val == "(":
-        return read_tail(src)
-    else:
-        raise SyntaxError("unexpected token: {0}".format(val))
+    return read_datum(src, [])
 
 def read_tail(src):
     """Return the remainder of a list in SRC, starting before an element or ).
@@ -160,27 +340,96 @@ def read_tail(src):
     >>> scheme_read(Buffer(tokenize_lines(["(1", "2 .", "'(3 4))", "4"])))
     Pair(1, Pair(2, Pair('quote', Pair(Pair(3, Pair(4, nil)), nil))))
     """
-    try:
-        if src.current() is None:
-            raise SyntaxError("unexpected end of file")
-        if src.current() == ")":
-            src.pop()
-            return nil
-
-        first = scheme_read(src)
-        if src.current() == ".":
-            src.pop()
-            second = scheme_read(src)
-            rest = read_tail(src)
-            if rest == nil:
-                return Pair(first, second)
-            else:
+    return read_datum(src, [PartialList()])
+
+class PartialList:
+    """The elements of a list read so far, followed by its TAIL if a dot has
+    been read.  STATE is ELEMENTS while reading elements, TAIL just after the
+    dot, and END when only a closing parenthesis may follow."""
+    ELEMENTS, TAIL, END = range(3)
+
+    def __init__(self):
+        self.elements = []
+        self.tail = nil
+        self.state = PartialList.ELEMENTS
+
+    def add(self, value):
+        """Add VALUE as the next element or as the tail of SELF."""
+        if self.state == PartialList.ELEMENTS:
+            self.elements.append(value)
+        else:
+            self.tail = value
+            self.state = PartialList.END
+
+    def to_pair(self):
+        """Return the list that has been read."""
+        result = self.tail
+        for length, value in enumerate(reversed(self.elements), 1):
+            result = Pair(value, result)
+            if self.tail is nil:
+                result.length = length
+        return result
+
+def read_datum(src, partial):
+    """Read from SRC until the innermost item of PARTIAL, a stack of
+    PartialLists and pending quotes ('), is completed and return it.  If
+    PARTIAL is empty, read a single datum.
+
+    Nested lists are read with the PARTIAL stack rather than by recursion, so
+    their length and depth are not limited by the Python stack."""
+    while True:
+        token = src.current()
+        innermost = partial[-1] if partial else None
+        if token is None:
+            if any(isinstance(p, PartialList) for p in partial):
+                raise SyntaxError("unexpected end of file")
+            raise EOFError
+        if isinstance(innermost, PartialList):
+            state = innermost.state
+            if token == ")" and state != PartialList.TAIL:
+                src.pop()
+                partial.pop()
+                value = innermost.to_pair()
+            elif state == PartialList.END:
                 raise SyntaxError("Expected one element after .")
+            elif (token == "." and state == PartialList.ELEMENTS
+                  and innermost.elements):
+                src.pop()
+                innermost.state = PartialList.TAIL
+                continue
+            else:
+                value = read_token(src, partial)
         else:
-            rest = read_tail(src)
-            return Pair(first, rest)
-    except EOFError:
-        raise SyntaxError("unexpected end of file")
+            value = read_token(src, partial)
+        if value is partial:
+            continue # The token began a list or quote
+
+        # Add VALUE to the innermost partial list, completing quotes
+        while partial and partial[-1] == "'":
+            partial.pop()
+            value = Pair('quote', Pair(value, nil))
+        if not partial:
+            return value
+        partial[-1].add(value)
+
+def read_token(src, partial):
+    """Pop the next token from SRC and return the atom it denotes.  For a token
+    that begins a list or quote, push it onto PARTIAL and return PARTIAL."""
+    val = src.pop()
+    if val == "nil":
+        return nil
+    elif val not in DELIMITERS:
+        if type(val) is str and val[0] == '"':
+            return String.parse(val)
+        return val
+    elif val == "'":
+        partial.append("'")
+        return partial
+    elif val == "(":
+        partial.append(PartialList())
+        return partial
+    else:
+        raise SyntaxError("unexpected token: {0}".format(val))
 
 # Convenience methods
 
@@ -1,6 +1,8 @@
 """Unit testing framework for the Scheme interpreter.
 
-Usage: python3 scheme_test.py FILE
+Usage: python3 scheme_test.py FILE [ENGINE]
+       python3 scheme_test.py [-engine ENGINE] [-j JOBS] [-timeout SECONDS]
+                              PATH...
 
 Interprets FILE as interactive Scheme source code, and compares each line
 of printed output from the read-eval-print loop and from any output functions
@@ -10,12 +12,24 @@ to an expected output described in a comment.  For example,
 ; expect 5
 
 Differences between printed and expected outputs are printed with line numbers.
+
+Given several PATHs, each a file, a directory of .scm files, or a glob
+pattern, runs the files in parallel, each in its own process with a fresh
+global frame, and summarizes all of their results together.  A file that
+runs longer than SECONDS, or stops with an unhandled exception, fails every
+test it contains.
 """
 
-import io
+import glob
+import multiprocessing
+import multiprocessing.connection
+import os
 import sys
+import time
 from buffer import Buffer
-from scheme import read_eval_print_loop, create_global_frame
+from scheme import (read_eval_print_loop, create_global_frame, use_engine,
+                    ENGINES)
+from scheme_primitives import OutputPort, set_output_port
 from scheme_tokens import tokenize_lines
 from ucb import main
 
@@ -41,10 +55,12 @@ def summarize(output, expected_output):
 EXPECT_STRING = '; expect'
 
 class TestReader:
-    """A TestReader is an iterable that collects test case expected results."""
-    def __init__(self, lines, stdout):
+    """A TestReader is an iterable that collects test case expected results,
+    and the lines of output written to PORT before each of them."""
+    def __init__(self, lines, port):
         self.lines = lines
-        self.stdout = stdout
+        self.port = port
+        self.out_lines = [''] # Lines of output; the last is not yet complete
         self.last_out_len = 0
         self.output = []
         self.expected_output = []
@@ -58,7 +74,10 @@ class TestReader:
                 expected = line.split(EXPECT_STRING, 1)[1][1:].split(' ; ')
                 for exp in expected:
                     self.expected_output.append((exp, self.line_number))
-                out_lines = self.stdout.getvalue().split('\n')
+                out_lines = self.out_lines
+                printed = self.port.take().split('\n')
+                out_lines[-1] += printed[0]
+                out_lines.extend(printed[1:])
                 if len(out_lines) > self.last_out_len:
                     self.output.extend(out_lines[-1-len(expected):-1])
                 else:
@@ -67,13 +86,17 @@ class TestReader:
             yield line
         raise EOFError
 
-@main
-def run_tests(src_file='tests.scm'):
-    """Run a read-eval loop that reads from src_file and collects outputs."""
-    sys.stderr = sys.stdout = io.StringIO() # Collect output to stdout and stderr
+def collect_outputs(src_file='tests.scm', engine='tail'):
+    """Run a read-eval loop that reads from src_file and collects outputs,
+    evaluating with the named ENGINE.  Return the printed outputs and the
+    (expected output, line number) pairs of the tests."""
+    use_engine(engine)
+    port = OutputPort() # Collect output and errors in a string port
+    previous = set_output_port(port)
+    sys.stderr = port
     reader = None
     try:
-        reader = TestReader(open(src_file).readlines(), sys.stdout)
+        reader = TestReader(open(src_file).readlines(), port)
         src = Buffer(tokenize_lines(reader))
         def next_line():
             src.current()
@@ -87,7 +110,121 @@ def run_tests(src_file='tests.scm'):
                   file=sys.stderr)
         raise
     finally:
-        sys.stdout = sys.__stdout__  # Revert stdout
+        set_output_port(previous)
         sys.stderr = sys.__stderr__  # Revert stderr
-    summarize(reader.output, reader.expected_output)
+    return reader.output, reader.expected_output
+
+def run_tests(src_file='tests.scm', engine='tail'):
+    """Run the tests in src_file with the named ENGINE and summarize them."""
+    summarize(*collect_outputs(src_file, engine))
+
+def expected_outputs(src_file):
+    """The (expected output, line number) pairs of the tests in src_file."""
+    reader = TestReader(open(src_file).readlines(), OutputPort())
+    try:
+        for line in reader:
+            pass
+    except EOFError:
+        pass
+    return reader.expected_output
+
+def test_files(paths):
+    """The Scheme files named by PATHS, each a file, a directory of .scm files,
+    or a glob pattern."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.scm'))))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            files.extend(sorted(glob.glob(path)))
+    return files
+
+def _test_worker(connection, src_file, engine):
+    """Send the outputs of the tests in src_file through CONNECTION, or a
+    description of the exception that stopped them."""
+    try:
+        result = collect_outputs(src_file, engine)
+    except BaseException as exc:
+        result = "{0}: {1}".format(type(exc).__name__, exc)
+    connection.send(result)
+    connection.close()
+
+def run_parallel_tests(files, engine='tail', jobs=None, timeout=None):
+    """Run the tests in each of FILES in a separate process, at most JOBS at a
+    time, stopping any that runs longer than TIMEOUT seconds.  Summarize the
+    results of all files together."""
+    jobs = jobs or os.cpu_count() or 1
+    pending, running, results = list(reversed(files)), {}, {}
+    while pending or running:
+        while pending and len(running) < jobs:
+            src_file = pending.pop()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_test_worker,
+                                              args=(sender, src_file, engine))
+            process.start()
+            sender.close()
+            running[receiver] = (src_file, process, time.monotonic())
+        wait = None
+        if timeout is not None:
+            oldest = min(started for _, _, started in running.values())
+            wait = max(0, oldest + timeout - time.monotonic())
+        for receiver in multiprocessing.connection.wait(list(running), wait):
+            src_file, process, _ = running.pop(receiver)
+            try:
+                results[src_file] = receiver.recv()
+            except EOFError:
+                results[src_file] = "process exited with code {0}".format(
+                    process.exitcode)
+            process.join()
+        for receiver, (src_file, process, started) in list(running.items()):
+            if timeout is not None and time.monotonic() - started >= timeout:
+                process.terminate()
+                process.join()
+                del running[receiver]
+                results[src_file] = "timed out after {0} seconds".format(timeout)
+
+    output, expected_output = [], []
+    for src_file in files:
+        result = results[src_file]
+        if isinstance(result, str): # The tests did not finish
+            print('{0}: {1}'.format(src_file, result))
+            expected = expected_outputs(src_file)
+            actual = ['(not run: {0})'.format(result)] * len(expected)
+        else:
+            actual, expected = result
+            actual = actual + [''] * (len(expected) - len(actual))
+        output.extend(actual)
+        expected_output.extend((exp, '{0}:{1}'.format(src_file, line))
+                               for exp, line in expected)
+    summarize(output, expected_output)
+
+@main
+def run(*argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='Scheme test runner')
+    parser.add_argument('-engine', choices=sorted(ENGINES), default='tail',
+                        help='evaluation engine (default: tail)')
+    parser.add_argument('-j', type=int, default=None, metavar='JOBS',
+                        help='number of files to run at once '
+                             '(default: the number of CPUs)')
+    parser.add_argument('-timeout', type=float, default=None,
+                        metavar='SECONDS', help='time limit for each file')
+    parser.add_argument('paths', nargs='*', default=['tests.scm'],
+                        metavar='PATH', help='test files, directories or globs')
+    args = parser.parse_args(argv)
 
+    paths, engine = args.paths, args.engine
+    if len(paths) == 2 and paths[1] in ENGINES and not os.path.exists(paths[1]):
+        paths, engine = paths[:1], paths[1] # Usage: FILE [ENGINE]
+    missing = [path for path in paths if not test_files([path])]
+    if missing:
+        parser.error('no test files match: {0}'.format(', '.join(missing)))
+    files = test_files(paths)
+    if not files:
+        parser.error('no test files to run')
+    if len(files) == 1 and args.j is None and args.timeout is None:
+        run_tests(files[0], engine)
+    else:
+        run_parallel_tests(files, engine, args.j, args.timeout)
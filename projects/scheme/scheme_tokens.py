@@ -12,102 +12,94 @@ in the course, such as quasiquoting and Scheme strings.
 """
 
 from ucb import main
+import functools
 import itertools
+import re
 import string
 import sys
-import tokenize
 
 _NUMERAL_STARTS = set(string.digits) | set('+-.')
 _SYMBOL_CHARS = (set('!$%&*/:<=>?@^_~') | set(string.ascii_lowercase) |
                  set(string.ascii_uppercase) | _NUMERAL_STARTS)
-_STRING_DELIMS = set('"')
-_WHITESPACE = set(' \t\n\r')
 _SINGLE_CHAR_TOKENS = set("()'`")
-_TOKEN_END = _WHITESPACE | _SINGLE_CHAR_TOKENS | _STRING_DELIMS | {',', ',@'}
 DELIMITERS = _SINGLE_CHAR_TOKENS | {'.', ',', ',@'}
 
+# Each match of _TOKEN_PATTERN skips whitespace and comments, then captures
+# the next candidate token, if any.  A lone quotation mark is an unclosed
+# string.
+_TOKEN_PATTERN = re.compile(r"""
+    (?: [ \t\n\r]+ | ;[^\n]* )*
+    ( [()'`] | ,@?
+    | "" | "(?:[^"\\\n]|\\.)*" | "
+    | \#[\s\S]? | [^ \t\n\r()'`",;][^ \t\n\r()'`",]*
+    )?""", re.VERBOSE)
+_SYMBOL_PATTERN = re.compile(r"[!$%&*/:<=>?@^_~a-zA-Z0-9+\-.]+")
+_INVALID = object()
+
 def valid_symbol(s):
     """Returns whether s is not a well-formed value."""
-    if len(s) == 0:
-        return False
-    for c in s:
-        if c not in _SYMBOL_CHARS:
-            return False
-    return True
+    return _SYMBOL_PATTERN.fullmatch(s) is not None
 
 def next_candidate_token(line, k):
     """A tuple (tok, k'), where tok is the next substring of line at or
     after position k that could be a token (assuming it passes a validity
     check), and k' is the position in line following that token.  Returns
     (None, len(line)) when there are no more tokens."""
-    while k < len(line):
-        c = line[k]
-        if c == ';':
-            return None, len(line)
-        elif c in _WHITESPACE:
-            k += 1
-        elif c in _SINGLE_CHAR_TOKENS:
-            return c, k+1
-        elif c == '#':  # Boolean values #t and #f
-            return line[k:k+2], min(k+2, len(line))
-        elif c == ',': # Unquote; check for @
-            if k+1 < len(line) and line[k+1] == '@':
-                return ',@', k+2
-            return c, k+1
-        elif c in _STRING_DELIMS:
-            if k+1 < len(line) and line[k+1] == c: # No triple quotes in Scheme
-                return c+c, k+2
-            line_bytes = (bytes(line[k:], encoding='utf-8'),)
-            gen = tokenize.tokenize(iter(line_bytes).__next__)
-            next(gen) # Throw away encoding token
-            token = next(gen)
-            if token.type != tokenize.STRING:
-                raise ValueError("invalid string: {0}".format(token.string))
-            return token.string, token.end[1]+k
-        else:
-            j = k
-            while j < len(line) and line[j] not in _TOKEN_END:
-                j += 1
-            return line[k:j], min(j, len(line))
-    return None, len(line)
+    match = _TOKEN_PATTERN.match(line, k)
+    text = match.group(1)
+    if text is None:
+        return None, len(line)
+    elif text == '"':
+        raise ValueError("invalid string: {0}".format(text))
+    return text, match.end()
+
+@functools.lru_cache(maxsize=4096)
+def token_value(text):
+    """The token for candidate token TEXT, or _INVALID if it is not one.  Most
+    candidates in a program recur, so their tokens are cached."""
+    if text in DELIMITERS:
+        return text
+    elif text[0] == '"':
+        if text == '"':
+            raise ValueError("invalid string: {0}".format(text))
+        return text
+    elif text == '#t' or text.lower() == 'true':
+        return True
+    elif text == '#f' or text.lower() == 'false':
+        return False
+    elif text == 'nil':
+        return text
+    elif text[0] in _SYMBOL_CHARS:
+        if text[0] in _NUMERAL_STARTS:
+            try:
+                return int(text)
+            except ValueError:
+                try:
+                    return float(text)
+                except ValueError:
+                    pass
+        if valid_symbol(text):
+            return text.lower()
+        raise ValueError("invalid numeral or symbol: {0}".format(text))
+    return _INVALID
+
+def warn_invalid(text, line, i):
+    """Report the invalid token TEXT, which ends at position I of LINE."""
+    print("warning: invalid token: {0}".format(text), file=sys.stderr)
+    print("    ", line, file=sys.stderr)
+    print(" " * (i+3), "^", file=sys.stderr)
 
 def tokenize_line(line):
     """The list of Scheme tokens on line.  Excludes comments and whitespace."""
     result = []
-    text, i = next_candidate_token(line, 0)
-    while text is not None:
-        if text in DELIMITERS:
-            result.append(text)
-        elif text == '#t' or text.lower() == 'true':
-            result.append(True)
-        elif text == '#f' or text.lower() == 'false':
-            result.append(False)
-        elif text == 'nil':
-            result.append(text)
-        elif text[0] in _SYMBOL_CHARS:
-            number = False
-            if text[0] in _NUMERAL_STARTS:
-                try:
-                    result.append(int(text))
-                    number = True
-                except ValueError:
-                    try:
-                        result.append(float(text))
-                        number = True
-                    except ValueError:
-                        pass
-            if not number:
-                if valid_symbol(text):
-                    result.append(text.lower())
-                else:
-                    raise ValueError("invalid numeral or symbol: {0}".format(text))
-        elif text[0] in _STRING_DELIMS:
-            result.append(text)
-        else:
-            print("warning: invalid token: {0}".format(text), file=sys.stderr)
-            print("    ", line, file=sys.stderr)
-            print(" " * (i+3), "^", file=sys.stderr)
-        text, i = next_candidate_token(line, i)
+    for match in _TOKEN_PATTERN.finditer(line):
+        text = match.group(1)
+        if text:
+            token = token_value(text)
+            if token is _INVALID:
+                warn_invalid(text, line, match.end(1))
+            else:
+                result.append(token)
     return result
 
 def tokenize_lines(input):
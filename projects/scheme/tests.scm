@@ -574,6 +574,119 @@ one-through-four
 ; expect 4
 
 
+;;;;;;;;;;;;;;;;;;;;;;;;;;;
+;;; Interpreter engines ;;;
+;;;;;;;;;;;;;;;;;;;;;;;;;;;
+
+;; A symbol defined by eval shadows one in an enclosing frame
+(define (shadow x)
+  (define (inner) (eval '(define x 99)) x)
+  (inner))
+(shadow 5)
+; expect 99
+
+;; Let bindings are evaluated in order
+(let ((a (display 1)) (b (display 2))) (newline))
+; expect 12 ; okay
+
+;; Formals must be a list of symbols
+((lambda x x) 1 2)
+; expect Error
+
+
+;;;;;;;;;;;;;;;;;;;;;;;;;;;
+;;; Vectors and strings ;;;
+;;;;;;;;;;;;;;;;;;;;;;;;;;;
+
+(define v (make-vector 3 'a))
+(vector? v)
+; expect True
+
+(vector-set! v 1 'b)
+(vector->list v)
+; expect (a b a)
+
+(vector-length (list->vector '(1 2 3 4)))
+; expect 4
+
+(vector-ref (vector 1 2) 1)
+; expect 2
+
+(vector-ref (vector 1 2) 2)
+; expect Error
+
+(vector-set! v -1 'c)
+; expect Error
+
+(make-vector -1)
+; expect Error
+
+(vector-length '(1 2))
+; expect Error
+
+(string-length (string-append "ab" "" "cde"))
+; expect 5
+
+(substring "hello" 1 3)
+; expect "el"
+
+(substring "hello" 2)
+; expect "llo"
+
+(substring "hello" 3 2)
+; expect Error
+
+(substring "hello" 0 6)
+; expect Error
+
+(string-append "ab" 'cd)
+; expect Error
+
+;; Escapes in string literals mean what they do in Python
+"\x41\tb"
+; expect "A\tb"
+
+(string-length "\q")
+; expect 2
+
+
+;;;;;;;;;;;;;;;;;;;
+;;; Hash tables ;;;
+;;;;;;;;;;;;;;;;;;;
+
+(define h (make-hash-table))
+(hash-ref h 'a)
+; expect Error
+
+(hash-ref h 'a 0)
+; expect 0
+
+(hash-set! h 'a 1)
+(hash-set! h 'a 2)
+(list (hash-ref h 'a) (hash-count h))
+; expect (2 1)
+
+;; Keys are compared with equal?, so equal lists are the same key
+(define k (list 1 2))
+(hash-set! h k 'two)
+(hash-ref h (list 1 2))
+; expect two
+
+;; Lists that differ only in nesting are different keys
+(list (hash-ref h '((1 2)) 'none) (hash-ref h '(1 (2)) 'none) (hash-count h))
+; expect (none none 2)
+
+(hash-set! h 1 'one)
+(list (hash-ref h 1) (hash-ref h #t 'none))
+; expect (one none)
+
+(hash-set! h (vector 1) 'v)
+; expect Error
+
+(hash-count '())
+; expect Error
+
+
 ;;;;;;;;;;;;;;;;;;;;
 ;;; Extra credit ;;;
 ;;;;;;;;;;;;;;;;;;;;